@@ -0,0 +1,100 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Returns a canned medical JSON response, either in one piece or streamed as
+Server-Sent Events a few characters at a time with a per-chunk delay, so
+streaming endpoints and time-to-first-byte can be checked without network
+access or an API key.
+
+Usage (from the backend directory):
+    python -m benchmarks.fake_llm_server --port 8001 --chunk-delay 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=test python main.py
+"""
+import json
+import time
+import asyncio
+import argparse
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+CANNED_RESPONSE = {
+    "answer": "Persistent headaches are often linked to tension, dehydration, poor sleep or eye strain. "
+              "Keep track of when they happen and what helps, and see a doctor if they get worse.",
+    "possible_conditions": ["tension headache", "migraine"],
+    "recommendations": "Stay hydrated, rest, and consult a healthcare provider if symptoms persist.",
+    "doctor_referrals": ["Neurologist", "General Practitioner"],
+    "precautions": "Seek emergency care for sudden severe headache or vision changes.",
+    "disclaimer": "This is not a substitute for professional medical advice."
+}
+
+app = FastAPI(title="Fake LLM server")
+app.state.chunk_size = 8
+app.state.chunk_delay = 0.02
+app.state.first_token_delay = 0.2
+
+
+def _chunk(completion_id, created, model, delta, finish_reason=None):
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "fake")
+    content = json.dumps(CANNED_RESPONSE)
+    completion_id = f"chatcmpl-fake-{time.time_ns()}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        await asyncio.sleep(app.state.first_token_delay + app.state.chunk_delay * len(content) / app.state.chunk_size)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }
+
+    async def events():
+        await asyncio.sleep(app.state.first_token_delay)
+        yield f"data: {json.dumps(_chunk(completion_id, created, model, {'role': 'assistant', 'content': ''}))}\n\n"
+        for start in range(0, len(content), app.state.chunk_size):
+            delta = {"content": content[start:start + app.state.chunk_size]}
+            yield f"data: {json.dumps(_chunk(completion_id, created, model, delta))}\n\n"
+            await asyncio.sleep(app.state.chunk_delay)
+        yield f"data: {json.dumps(_chunk(completion_id, created, model, {}, 'stop'))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--chunk-size", type=int, default=8, help="Characters per streamed chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="Seconds between chunks")
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="Seconds before the first chunk")
+    args = parser.parse_args()
+
+    app.state.chunk_size = max(1, args.chunk_size)
+    app.state.chunk_delay = args.chunk_delay
+    app.state.first_token_delay = args.first_token_delay
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
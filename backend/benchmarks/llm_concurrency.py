@@ -0,0 +1,91 @@
+"""
+Check that concurrent doctor queries overlap instead of queueing.
+
+Starts the fake LLM server in-process, points the shared LLM client at it
+and runs N distinct medical queries through process_medical_query, first
+one alone and then all at once. With a non-blocking client the concurrent
+batch finishes in about one LLM latency; a blocking client would take
+about N.
+
+Usage (from the backend directory):
+    python -m benchmarks.llm_concurrency --requests 20 --latency 0.5
+"""
+import time
+import socket
+import asyncio
+import argparse
+
+import uvicorn
+
+from benchmarks import fake_llm_server
+from services.ai_doctor import process_medical_query
+from services.llm_client import llm_client
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _timed_queries(count, offset=0):
+    # Every query differs so identical in-flight calls cannot be coalesced
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        process_medical_query(f"benchmark-{offset + i}", f"Why do I get headaches? (#{offset + i})")
+        for i in range(count)
+    ))
+    elapsed = time.perf_counter() - started
+    failures = [result["message"] for result in results if result["status"] != "success"]
+    if failures:
+        raise RuntimeError(f"{len(failures)} queries failed, first: {failures[0]}")
+    return elapsed
+
+
+async def run(requests, latency):
+    """
+    Time one query alone and a batch of concurrent queries.
+
+    Returns:
+        dict: Single and batch timings and the batch time in units of one query
+    """
+    port = _free_port()
+    fake_llm_server.app.state.first_token_delay = latency
+    fake_llm_server.app.state.chunk_delay = 0
+    server = uvicorn.Server(uvicorn.Config(fake_llm_server.app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    llm_client.base_url = f"http://127.0.0.1:{port}/v1"
+    llm_client.api_key = "benchmark"
+    try:
+        single = await _timed_queries(1)
+        batch = await _timed_queries(requests, offset=1)
+    finally:
+        await llm_client.close()
+        server.should_exit = True
+        await serving
+
+    return {
+        "requests": requests,
+        "max_concurrency": llm_client.max_concurrency,
+        "single_seconds": round(single, 3),
+        "concurrent_seconds": round(batch, 3),
+        "concurrent_in_single_latencies": round(batch / single, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20, help="Concurrent queries to send")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake LLM response time in seconds")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(max(1, args.requests), args.latency))
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compare live-stream pose inference with and without motion gating.
+
+Replays recorded clips frame by frame through detect_landmarks, the same
+function the vision workers run, with the session's MotionGate set to each
+setting. Reports how many frames ran inference, the time per frame and the
+rep count for each setting, so the threshold can be tuned without losing
+reps.
+
+Usage (from the backend directory):
+    python -m benchmarks.motion_gating clip1.mp4 clip2.mp4 --exercise 1 --threshold 2 --max-skip 5
+"""
+import argparse
+import time
+
+import cv2
+
+from services.ai_gymtrainer import GymTrainerService
+from services.motion_gate import MotionGate
+from services.pose_angles import joint_angles
+from services.pose_pool import pose_pool
+from services.vision_executor import detect_landmarks, release_session
+
+
+def run_clip(path, exercise_choice, threshold, max_skip):
+    """
+    Replay a clip as a stream of JPEG frames and count reps.
+
+    Returns:
+        dict: Frame, inference and rep counts with timings
+    """
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video file: {path}")
+
+    session_key = f"benchmark-{path}-{threshold}-{max_skip}"
+    # detect_landmarks keeps its gate in the session state; seed it with this setting
+    _, state = pose_pool.lease_with_state(session_key)
+    state["motion_gate"] = MotionGate(threshold=threshold, max_skip=max_skip)
+    tracker = GymTrainerService()
+    frames = inferred = 0
+    elapsed = 0.0
+
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            # Clients send JPEG frames, so include decoding in the measurement
+            ok, encoded = cv2.imencode(".jpg", frame)
+            if not ok:
+                continue
+            frames += 1
+
+            started = time.perf_counter()
+            landmarks, ran_inference = detect_landmarks(session_key, encoded.tobytes())
+            elapsed += time.perf_counter() - started
+            inferred += ran_inference
+
+            if landmarks is not None:
+                tracker.recognise_landmarks(landmarks, joint_angles(landmarks), exercise_choice)
+    finally:
+        capture.release()
+        release_session(session_key)
+
+    return {
+        "frames": frames,
+        "inferred": inferred,
+        "reps": tracker.exercise_counters[exercise_choice],
+        "ms_per_frame": round(elapsed * 1000 / frames, 2) if frames else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("clips", nargs="+", help="Recorded workout videos")
+    parser.add_argument("--exercise", type=int, default=1, help="1=Squat, 2=Curl, 3=Sit-up, 4=Lunge, 5=Pushup")
+    parser.add_argument("--threshold", type=float, default=2.0, help="Motion threshold (0-255 mean abs diff)")
+    parser.add_argument("--max-skip", type=int, default=5, help="Max consecutive frames reusing landmarks")
+    args = parser.parse_args()
+
+    print(f"{'clip':<32} {'mode':<8} {'frames':>7} {'inferred':>9} {'reps':>5} {'ms/frame':>9}")
+    for path in args.clips:
+        baseline = run_clip(path, args.exercise, 0, 0)
+        gated = run_clip(path, args.exercise, args.threshold, args.max_skip)
+        for mode, result in (("full", baseline), ("gated", gated)):
+            print(f"{path[-32:]:<32} {mode:<8} {result['frames']:>7} {result['inferred']:>9} "
+                  f"{result['reps']:>5} {result['ms_per_frame']:>9}")
+        if gated["reps"] != baseline["reps"]:
+            print(f"  warning: gating changed the rep count ({baseline['reps']} -> {gated['reps']})")
+
+
+if __name__ == "__main__":
+    main()
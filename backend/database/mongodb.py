@@ -1,8 +1,14 @@
 import os
+import time
+import asyncio
 import motor.motor_asyncio
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.errors import CollectionInvalid
 from dotenv import load_dotenv
 
+from database.write_buffer import WriteBuffer
+from database.repository import UserRecordRepository, find_user_page
+
 # Load environment variables
 load_dotenv()
 
@@ -10,49 +16,220 @@ load_dotenv()
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
 MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "ai_healthcare_platform")
 
+# Write-behind settings for exercise records
+EXERCISE_WRITE_BATCH_SIZE = int(os.getenv("EXERCISE_WRITE_BATCH_SIZE", "100"))
+EXERCISE_WRITE_FLUSH_INTERVAL = float(os.getenv("EXERCISE_WRITE_FLUSH_INTERVAL", "1.0"))
+EXERCISE_WRITE_ORDERED = os.getenv("EXERCISE_WRITE_ORDERED", "true").lower() == "true"
+
+# Write-behind settings for report, medical query and diet plan records
+RECORD_WRITE_BATCH_SIZE = int(os.getenv("RECORD_WRITE_BATCH_SIZE", "50"))
+RECORD_WRITE_FLUSH_INTERVAL = float(os.getenv("RECORD_WRITE_FLUSH_INTERVAL", "1.0"))
+
+# Start serving before collections and indexes are bootstrapped
+MONGODB_LAZY_STARTUP = os.getenv("MONGODB_LAZY_STARTUP", "false").lower() == "true"
+
+# Collections created at startup if missing
+COLLECTIONS = (
+    "patient_records", "exercise_records", "exercise_angle_chunks", "medical_queries", "diet_plans",
+    "response_cache", "report_jobs"
+)
+
+# Indexes created at startup: collection -> [(keys, create_index options)]
+COLLECTION_INDEXES = {
+    "exercise_records": [
+        # Serves per-user history in newest-first order, including the keyset tiebreaker
+        ([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], {"name": "user_timestamp"}),
+    ],
+    "exercise_angle_chunks": [
+        # Reassembles one session's series in order
+        ([("session_key", ASCENDING), ("series", ASCENDING), ("start", ASCENDING)], {"name": "session_series"}),
+    ],
+    "response_cache": [
+        # Expire cached LLM responses once their expires_at passes
+        ("expires_at", {"expireAfterSeconds": 0}),
+        ("namespace", {}),
+    ],
+    # Serve per-user history lists in newest-first order, including the keyset tiebreaker
+    "patient_records": [
+        ([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "user_created"}),
+    ],
+    "medical_queries": [
+        ([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "user_created"}),
+    ],
+    "diet_plans": [
+        ([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "user_created"}),
+    ],
+    "report_jobs": [
+        # Finds unfinished jobs to resume at startup
+        ([("status", ASCENDING), ("created_at", ASCENDING)], {"name": "status_created"}),
+        ([("user_id", ASCENDING), ("created_at", DESCENDING)], {"name": "user_created"}),
+    ],
+}
+
 # Global variables for database connections
 client = None
 db = None
+bootstrap_task = None
+startup_timings = {}
+
+# Coalesces exercise record inserts into insert_many batches
+exercise_write_buffer = WriteBuffer(
+    lambda: db.exercise_records,
+    batch_size=EXERCISE_WRITE_BATCH_SIZE,
+    flush_interval=EXERCISE_WRITE_FLUSH_INTERVAL,
+    ordered=EXERCISE_WRITE_ORDERED
+)
+
+# Full-resolution angle series spilled from long exercise sessions
+angle_chunk_write_buffer = WriteBuffer(
+    lambda: db.exercise_angle_chunks,
+    batch_size=EXERCISE_WRITE_BATCH_SIZE,
+    flush_interval=EXERCISE_WRITE_FLUSH_INTERVAL,
+    ordered=False
+)
+
+
+def _record_buffer(collection_name):
+    return WriteBuffer(
+        lambda: db[collection_name],
+        batch_size=RECORD_WRITE_BATCH_SIZE,
+        flush_interval=RECORD_WRITE_FLUSH_INTERVAL,
+        ordered=False
+    )
+
+
+# Per-user records for the compounder, doctor and dietician services; list
+# views read only the summary fields, never the stored LLM payload
+patient_record_repository = UserRecordRepository(
+    lambda: db.patient_records, _record_buffer("patient_records"),
+    summary_fields=("created_at", "filename", "summary", "medication_count")
+)
+medical_query_repository = UserRecordRepository(
+    lambda: db.medical_queries, _record_buffer("medical_queries"),
+    summary_fields=("created_at", "query", "response_summary", "possible_conditions")
+)
+diet_plan_repository = UserRecordRepository(
+    lambda: db.diet_plans, _record_buffer("diet_plans"),
+    summary_fields=("created_at", "title", "daily_calories")
+)
+
+RECORD_REPOSITORIES = (patient_record_repository, medical_query_repository, diet_plan_repository)
+
 
+async def connect_to_mongo(lazy=MONGODB_LAZY_STARTUP):
+    """
+    Connect to MongoDB and initialize global db variable.
 
-async def connect_to_mongo():
-    """Connect to MongoDB and initialize global db variable."""
-    global client, db
+    In lazy mode the collection and index bootstrap runs in the background
+    so the app can start serving routes that don't need the database.
+    """
+    global client, db, bootstrap_task
     try:
         client = motor.motor_asyncio.AsyncIOMotorClient(MONGODB_URI)
         db = client[MONGODB_DB_NAME]
 
-        # Verify connection
-        await db.command("ping")
-        print(f"Connected to MongoDB: {MONGODB_DB_NAME}")
+        exercise_write_buffer.start()
+        angle_chunk_write_buffer.start()
+        for repository in RECORD_REPOSITORIES:
+            repository.write_buffer.start()
 
-        # Create collections if they don't exist
-        if "patient_records" not in await db.list_collection_names():
-            await db.create_collection("patient_records")
-        if "exercise_records" not in await db.list_collection_names():
-            await db.create_collection("exercise_records")
-        if "medical_queries" not in await db.list_collection_names():
-            await db.create_collection("medical_queries")
-        if "diet_plans" not in await db.list_collection_names():
-            await db.create_collection("diet_plans")
+        if lazy:
+            bootstrap_task = asyncio.create_task(_bootstrap_in_background())
+        else:
+            await bootstrap_database()
 
     except Exception as e:
         print(f"Error connecting to MongoDB: {e}")
         raise
 
 
+async def _bootstrap_in_background():
+    try:
+        await bootstrap_database()
+    except Exception as e:
+        print(f"Error bootstrapping MongoDB: {e}")
+
+
+async def _create_collection(name):
+    try:
+        await db.create_collection(name)
+    except CollectionInvalid:
+        # Another worker created it after we listed the collections
+        pass
+
+
+async def bootstrap_database():
+    """
+    Verify the connection, then create missing collections and indexes concurrently.
+
+    Each phase's duration in milliseconds is recorded in startup_timings.
+    """
+    started = time.perf_counter()
+    phase_started = started
+
+    def record(phase):
+        nonlocal phase_started
+        now = time.perf_counter()
+        startup_timings[phase] = round((now - phase_started) * 1000, 1)
+        phase_started = now
+
+    # Verify connection
+    await db.command("ping")
+    record("ping_ms")
+    print(f"Connected to MongoDB: {MONGODB_DB_NAME}")
+
+    # List collections once, then create the missing ones concurrently
+    existing = set(await db.list_collection_names())
+    record("list_collections_ms")
+
+    await asyncio.gather(*(_create_collection(name) for name in COLLECTIONS if name not in existing))
+    record("create_collections_ms")
+
+    await ensure_indexes()
+    record("create_indexes_ms")
+
+    startup_timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    startup_timings["ready"] = True
+    print(f"MongoDB bootstrap finished: {startup_timings}")
+
+
+async def ensure_indexes():
+    """Create the indexes that back the read paths, all concurrently."""
+    await asyncio.gather(*(
+        db[collection].create_index(keys, **options)
+        for collection, indexes in COLLECTION_INDEXES.items()
+        for keys, options in indexes
+    ))
+
+
+def database_status():
+    """Report whether the bootstrap has finished and how long each phase took."""
+    buffers = [exercise_write_buffer, angle_chunk_write_buffer] + [r.write_buffer for r in RECORD_REPOSITORIES]
+    return {
+        "ready": startup_timings.get("ready", False),
+        "timings": dict(startup_timings),
+        "dropped_writes": sum(buffer.dropped for buffer in buffers)
+    }
+
+
 async def close_mongo_connection():
     """Close MongoDB connection."""
     global client
+    if bootstrap_task is not None and not bootstrap_task.done():
+        bootstrap_task.cancel()
     if client:
+        # Write out buffered records before the connection goes away
+        await exercise_write_buffer.close()
+        await angle_chunk_write_buffer.close()
+        for repository in RECORD_REPOSITORIES:
+            await repository.write_buffer.close()
         client.close()
         print("MongoDB connection closed")
 
 
 # Database operations for exercise tracking
-async def save_exercise_data(user_id, exercise_data):
-    """Save exercise tracking data to MongoDB."""
-    exercise_record = {
+def _exercise_record(user_id, exercise_data):
+    return {
         "user_id": user_id,
         "timestamp": exercise_data.get("timestamp"),
         "exercise_type": exercise_data.get("exercise_type"),
@@ -60,14 +237,72 @@ async def save_exercise_data(user_id, exercise_data):
         "accuracy": exercise_data.get("accuracy"),
         "feedback": exercise_data.get("feedback")
     }
-    result = await db.exercise_records.insert_one(exercise_record)
-    return result.inserted_id
 
 
-async def get_user_exercise_history(user_id):
-    """Retrieve exercise history for a specific user."""
-    cursor = db.exercise_records.find({"user_id": user_id}).sort("timestamp", -1)
-    exercise_history = await cursor.to_list(length=100)
-    return exercise_history
+async def save_exercise_data(user_id, exercise_data):
+    """Queue exercise tracking data for a buffered write to MongoDB."""
+    return await exercise_write_buffer.add(_exercise_record(user_id, exercise_data))
+
+
+async def save_exercise_records(user_id, exercise_data_list):
+    """Queue several exercise records for a user as one buffered batch."""
+    return await exercise_write_buffer.add_many(
+        [_exercise_record(user_id, exercise_data) for exercise_data in exercise_data_list]
+    )
+
+
+async def save_angle_chunks(chunks):
+    """Queue full-resolution angle series chunks for a buffered write to MongoDB."""
+    return await angle_chunk_write_buffer.add_many(chunks)
+
+
+# Fields returned by the history endpoint when no projection is requested
+EXERCISE_HISTORY_FIELDS = ("timestamp", "exercise_type", "reps", "accuracy", "feedback")
+
+
+async def get_user_exercise_history(user_id, limit=20, cursor=None, start=None, end=None, fields=None):
+    """
+    Retrieve one page of a user's exercise history, newest first.
+
+    Args:
+        user_id: The ID of the user
+        limit: Maximum number of records to return
+        cursor: Cursor from a previous page's next_cursor
+        start: Only include records at or after this ISO timestamp
+        end: Only include records at or before this ISO timestamp
+        fields: Record fields to return; defaults to EXERCISE_HISTORY_FIELDS
+
+    Returns:
+        dict: The page's records and the cursor for the next page, or None at the end
+    """
+    return await find_user_page(
+        db.exercise_records, user_id, "timestamp", fields or EXERCISE_HISTORY_FIELDS,
+        limit=limit, cursor=cursor, start=start, end=end
+    )
+
+# Database operations for report analysis jobs
+async def create_report_job(job):
+    """Insert a new report analysis job; job["_id"] is the job ID."""
+    await db.report_jobs.insert_one(job)
+    return job["_id"]
+
+
+async def update_report_job(job_id, fields):
+    """Set fields on a report analysis job."""
+    await db.report_jobs.update_one({"_id": job_id}, {"$set": fields})
+
+
+async def get_report_job(job_id):
+    """Return a report analysis job, or None if it does not exist."""
+    return await db.report_jobs.find_one({"_id": job_id})
+
+
+async def get_unfinished_report_jobs(statuses=("queued", "running")):
+    """Return jobs left unfinished by a previous run, oldest first."""
+    return await (
+        db.report_jobs.find({"status": {"$in": list(statuses)}})
+        .sort("created_at", ASCENDING)
+        .to_list(length=None)
+    )
 
 # Add similar functions for other collections as needed
\ No newline at end of file
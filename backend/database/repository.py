@@ -0,0 +1,155 @@
+import os
+import json
+import base64
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import DESCENDING
+
+# Length of the text previews stored for list views
+RECORD_PREVIEW_CHARS = int(os.getenv("RECORD_PREVIEW_CHARS", "200"))
+
+
+def preview_text(value, limit=RECORD_PREVIEW_CHARS):
+    """Shorten text for a list-view summary field."""
+    text = " ".join(str(value or "").split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def encode_cursor(timestamp, record_id):
+    """Encode a keyset position as an opaque URL-safe cursor."""
+    payload = json.dumps({"t": timestamp, "id": str(record_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return payload["t"], ObjectId(payload["id"])
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+
+async def find_user_page(collection, user_id, time_field, fields, limit=20, cursor=None, start=None, end=None):
+    """
+    Retrieve one page of a user's records, newest first, with keyset pagination.
+
+    Relies on a (user_id, time_field desc, _id desc) index so every page is
+    a bounded index range scan however deep the client has paged.
+
+    Args:
+        collection: Motor collection to read
+        user_id: The ID of the user
+        time_field: ISO timestamp field records are ordered by
+        fields: Fields to return
+        limit: Maximum number of records to return
+        cursor: Cursor from a previous page's next_cursor
+        start: Only include records at or after this ISO timestamp
+        end: Only include records at or before this ISO timestamp
+
+    Returns:
+        dict: The page's records and the cursor for the next page, or None at the end
+    """
+    conditions = [{"user_id": user_id}]
+
+    time_range = {}
+    if start is not None:
+        time_range["$gte"] = start
+    if end is not None:
+        time_range["$lte"] = end
+    if time_range:
+        conditions.append({time_field: time_range})
+
+    # Keyset pagination: continue strictly after the last record of the previous page
+    if cursor:
+        last_time, last_id = decode_cursor(cursor)
+        conditions.append({"$or": [
+            {time_field: {"$lt": last_time}},
+            {time_field: last_time, "_id": {"$lt": last_id}}
+        ]})
+
+    projection = {field: 1 for field in fields}
+    projection[time_field] = 1
+
+    query = conditions[0] if len(conditions) == 1 else {"$and": conditions}
+    documents = await (
+        collection.find(query, projection)
+        .sort([(time_field, DESCENDING), ("_id", DESCENDING)])
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
+    )
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1].get(time_field), documents[-1]["_id"])
+
+    items = []
+    for document in documents:
+        document["id"] = str(document.pop("_id"))
+        items.append(document)
+
+    return {"items": items, "next_cursor": next_cursor}
+
+
+class UserRecordRepository:
+    """
+    Per-user records written behind a WriteBuffer and read back page by page.
+
+    Saves return the record's id immediately and the insert happens in the
+    buffer's next batch. List reads project only ``summary_fields``, which
+    are computed at write time, so history screens never load the full LLM
+    payload; a single record is fetched in full by id.
+    """
+
+    def __init__(self, get_collection, write_buffer, summary_fields, time_field="created_at"):
+        self.get_collection = get_collection
+        self.write_buffer = write_buffer
+        self.summary_fields = tuple(summary_fields)
+        self.time_field = time_field
+
+    async def save(self, user_id, document):
+        """
+        Queue a record for the user.
+
+        Returns:
+            str: The id the record will be stored under
+        """
+        document = dict(document)
+        document["user_id"] = user_id
+        document.setdefault(self.time_field, datetime.now().isoformat())
+        return str(await self.write_buffer.add(document))
+
+    async def list(self, user_id, limit=20, cursor=None, start=None, end=None):
+        """Return one newest-first page of the user's record summaries."""
+        # Write out queued records first so users see what they just saved
+        if len(self.write_buffer):
+            await self.write_buffer.flush()
+        return await find_user_page(
+            self.get_collection(), user_id, self.time_field, self.summary_fields,
+            limit=limit, cursor=cursor, start=start, end=end
+        )
+
+    async def get(self, user_id, record_id):
+        """
+        Return one of the user's records in full, or None if it does not exist.
+
+        Raises:
+            ValueError: If record_id is not a valid id
+        """
+        try:
+            object_id = ObjectId(record_id)
+        except Exception:
+            raise ValueError("Invalid record id")
+        if len(self.write_buffer):
+            await self.write_buffer.flush()
+        document = await self.get_collection().find_one({"_id": object_id, "user_id": user_id})
+        if document is not None:
+            document["id"] = str(document.pop("_id"))
+        return document
@@ -0,0 +1,142 @@
+import os
+import asyncio
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+# Most documents a buffer holds while MongoDB is unavailable; the oldest are dropped beyond it
+WRITE_BUFFER_MAX_PENDING = int(os.getenv("WRITE_BUFFER_MAX_PENDING", "10000"))
+
+
+class WriteBuffer:
+    """
+    Write-behind buffer that coalesces inserts into ``insert_many`` batches.
+
+    Documents are queued in memory and written when the buffer reaches
+    ``batch_size`` documents or every ``flush_interval`` seconds, whichever
+    comes first. Ids are assigned client-side so callers get them straight
+    away. In unordered mode one bad document does not stop the rest of its
+    batch from being written. Failed batches are kept for the next flush,
+    but at most ``max_pending`` documents are held; older ones are dropped
+    and counted in ``dropped`` so an outage cannot exhaust memory.
+    """
+
+    def __init__(self, get_collection, batch_size=100, flush_interval=1.0, ordered=True,
+                 max_pending=WRITE_BUFFER_MAX_PENDING):
+        self.get_collection = get_collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.ordered = ordered
+        self.max_pending = max(max_pending, batch_size)
+        self.dropped = 0
+        self._pending = []
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    def start(self):
+        """Start the periodic flush task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def add(self, document):
+        """
+        Queue one document for insertion.
+
+        Returns:
+            ObjectId: The id the document will be stored under
+        """
+        return (await self.add_many([document]))[0]
+
+    async def add_many(self, documents):
+        """
+        Queue several documents for insertion.
+
+        Returns:
+            list: The ids the documents will be stored under
+        """
+        ids = []
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+            ids.append(document["_id"])
+        self._pending.extend(documents)
+        self._drop_overflow()
+
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+        return ids
+
+    def _drop_overflow(self):
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.dropped += overflow
+            print(f"Write buffer full ({self.max_pending} documents), dropped the {overflow} oldest")
+
+    async def flush(self):
+        """
+        Write every queued document.
+
+        Returns:
+            int: Number of documents written
+        """
+        async with self._flush_lock:
+            written = 0
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:len(batch)]
+                try:
+                    written += await self._insert(batch, self.ordered)
+                except BulkWriteError as e:
+                    written += self._dropped_errors(e)
+                    inserted = e.details.get("nInserted", 0)
+                    remainder = batch[inserted + 1:]
+                    if self.ordered and remainder:
+                        # An ordered batch stops at the first error; write the rest once without
+                        # ordering so further bad documents are dropped instead of requeued
+                        try:
+                            written += await self._insert(remainder, False)
+                        except BulkWriteError as remainder_error:
+                            written += self._dropped_errors(remainder_error)
+                        except Exception as remainder_error:
+                            self._requeue(remainder, remainder_error)
+                            break
+                except Exception as e:
+                    self._requeue(batch, e)
+                    break
+            return written
+
+    async def _insert(self, batch, ordered):
+        result = await self.get_collection().insert_many(batch, ordered=ordered)
+        return len(result.inserted_ids)
+
+    def _dropped_errors(self, error):
+        # Duplicates or invalid documents will never succeed, so they are dropped
+        failed = len(error.details.get("writeErrors", []))
+        self.dropped += failed
+        print(f"Buffered write dropped {failed} documents: {error}")
+        return error.details.get("nInserted", 0)
+
+    def _requeue(self, batch, error):
+        # Keep the batch for the next flush if the server is unavailable
+        self._pending[:0] = batch
+        self._drop_overflow()
+        print(f"Buffered write failed, will retry: {error}")
+
+    async def close(self):
+        """Stop the periodic flush and write everything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def __len__(self):
+        return len(self._pending)
@@ -1,3 +1,4 @@
+import asyncio
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -8,7 +9,13 @@ load_dotenv()
 
 # Import routers
 from routers import compounder, doctor, dietician, gymtrainer
-from database.mongodb import connect_to_mongo, close_mongo_connection
+from database.mongodb import connect_to_mongo, close_mongo_connection, database_status
+from services.gym_sessions import session_manager
+from services.vision_executor import vision_executor
+from services.video_analysis import video_executor
+from services.llm_client import llm_client
+from services.doctor_directory import doctor_directory
+from services.report_jobs import report_job_queue
 
 # Create FastAPI app
 app = FastAPI(
@@ -39,7 +46,32 @@ async def startup_db_client():
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Report workers write job state, so stop them before the connection closes
+    await report_job_queue.stop()
     await close_mongo_connection()
+    await llm_client.close()
+
+# Load the doctor directory once instead of per request
+@app.on_event("startup")
+async def load_doctor_directory():
+    doctor_directory.load()
+
+# Background workers for queued report analyses; jobs left by a previous run
+# are recovered in the background so startup does not wait on MongoDB
+@app.on_event("startup")
+async def start_report_jobs():
+    await report_job_queue.start()
+
+# Exercise session housekeeping
+@app.on_event("startup")
+async def start_session_sweeper():
+    app.state.session_sweeper = asyncio.create_task(session_manager.run_sweeper())
+
+@app.on_event("shutdown")
+async def stop_session_sweeper():
+    app.state.session_sweeper.cancel()
+    vision_executor.shutdown()
+    video_executor.shutdown()
 
 @app.get("/")
 async def root():
@@ -53,5 +85,14 @@ async def root():
         ]
     }
 
+@app.get("/health")
+async def health():
+    # Healthy while Mongo is still warming up in lazy mode; readiness is reported separately
+    return {
+        "status": "ok",
+        "database": database_status(),
+        "llm": llm_client.stats()
+    }
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
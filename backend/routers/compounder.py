@@ -1,10 +1,17 @@
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, status
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query, status
 from pydantic import BaseModel
 from typing import Optional, List
 import json
+import os
+from urllib.parse import quote
 
 # Import services
 from services.ai_compounder import analyze_medical_report, save_analysis_to_db
+from database.mongodb import patient_record_repository
+from services.report_jobs import (
+    report_job_queue, ReportQueueFull, REPORT_UPLOAD_MAX_BYTES, validate_callback_url
+)
+from services.upload_spool import spool_upload, UploadTooLarge
 
 router = APIRouter()
 
@@ -32,7 +39,7 @@ async def analyze_report(
         contents = await file.read()
 
         # Process the image with AI service
-        analysis_result = await analyze_medical_report(contents)
+        analysis_result = await analyze_medical_report(contents, user_id)
 
         # Save to database if analysis was successful
         if analysis_result["status"] == "success":
@@ -51,22 +58,120 @@ async def analyze_report(
         )
 
 
-@router.get("/user-reports/{user_id}", response_model=dict)
-async def get_user_reports(user_id: str):
+@router.post("/analyze-report/jobs", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
+async def submit_report_job(
+        file: UploadFile = File(...),
+        user_id: str = Form(...),
+        callback_url: Optional[str] = Form(None),
+):
     """
-    Endpoint to retrieve a user's previous medical report analyses.
+    Endpoint to queue a medical report for background analysis.
+
+    - Accepts the same upload as /analyze-report and returns a job ID immediately
+    - Poll /jobs/{job_id}?user_id=... for the result; pass an https callback_url to be sent the
+      job ID and status when it finishes
     """
-    # This would normally fetch from MongoDB
-    # For now, return placeholder data
+    if callback_url:
+        try:
+            await validate_callback_url(callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    job_id = report_job_queue.new_job_id()
+    path = report_job_queue.spool_path(job_id)
+
+    # Spool the upload to disk in chunks instead of holding it in memory
+    try:
+        size = await spool_upload(file, path, max_bytes=REPORT_UPLOAD_MAX_BYTES)
+        job = await report_job_queue.submit(
+            job_id, user_id, file.filename, file.content_type, size, callback_url
+        )
+    except UploadTooLarge as e:
+        os.unlink(path)
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ReportQueueFull as e:
+        os.unlink(path)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except Exception as e:
+        os.unlink(path)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error queueing report: {str(e)}"
+        )
+
     return {
         "status": "success",
         "data": {
-            "reports": [
-                {
-                    "id": "sample_report_id_1",
-                    "date": "2025-03-01T10:30:00",
-                    "summary": "Sample medical report analysis"
-                }
-            ]
+            "job_id": job_id,
+            "status": job["status"],
+            "status_url": f"/api/compounder/jobs/{job_id}?user_id={quote(user_id)}"
         }
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/jobs/{job_id}", response_model=dict)
+async def get_report_job_status(job_id: str, user_id: str = Query(...)):
+    """
+    Endpoint to check a report analysis job; completed jobs include the analysis.
+
+    - **user_id**: The user who submitted the job; other users get a 404
+    """
+    try:
+        job = await report_job_queue.get(job_id, user_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving job: {str(e)}"
+        )
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return {"status": "success", "data": job}
+
+
+@router.get("/user-reports/{user_id}", response_model=dict)
+async def get_user_reports(
+        user_id: str,
+        limit: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = None
+):
+    """
+    Endpoint to retrieve a user's previous report analyses, newest first, one page at a time.
+
+    - **limit**: Maximum number of report analyses per page (1-100, default: 20)
+    - **cursor**: The next_cursor value from the previous page
+    """
+    try:
+        page = await patient_record_repository.list(user_id, limit=limit, cursor=cursor)
+        return {
+            "status": "success",
+            "data": {
+                "reports": page["items"],
+                "next_cursor": page["next_cursor"]
+            }
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving report analyses: {str(e)}"
+        )
+
+
+@router.get("/user-reports/{user_id}/{report_id}", response_model=dict)
+async def get_user_report(user_id: str, report_id: str):
+    """
+    Endpoint to retrieve a single report analysis in full.
+    """
+    try:
+        record = await patient_record_repository.get(user_id, report_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving report analysis: {str(e)}"
+        )
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report analysis not found")
+    return {"status": "success", "data": record}
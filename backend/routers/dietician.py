@@ -1,9 +1,13 @@
-from fastapi import APIRouter, HTTPException, status, Body
+from fastapi import APIRouter, HTTPException, Query, status, Body
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 
 # Import services
-from services.ai_dietician import generate_diet_plan, predict_health_metrics, save_diet_plan
+from services.ai_dietician import (
+    generate_diet_plan, predict_health_metrics, save_diet_plan, DIETICIAN_CACHE_NAMESPACES
+)
+from services.response_cache import response_cache
+from database.mongodb import diet_plan_repository
 
 router = APIRouter()
 
@@ -77,21 +81,83 @@ async def health_predictions(user_data: UserHealthData):
 
 
 @router.get("/user-diet-plans/{user_id}", response_model=dict)
-async def get_user_diet_plans(user_id: str):
+async def get_user_diet_plans(
+        user_id: str,
+        limit: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = None
+):
     """
-    Endpoint to retrieve a user's previous diet plans.
+    Endpoint to retrieve a user's previous diet plans, newest first, one page at a time.
+
+    - **limit**: Maximum number of diet plans per page (1-100, default: 20)
+    - **cursor**: The next_cursor value from the previous page
+    """
+    try:
+        page = await diet_plan_repository.list(user_id, limit=limit, cursor=cursor)
+        return {
+            "status": "success",
+            "data": {
+                "diet_plans": page["items"],
+                "next_cursor": page["next_cursor"]
+            }
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving diet plans: {str(e)}"
+        )
+
+
+@router.get("/user-diet-plans/{user_id}/{plan_id}", response_model=dict)
+async def get_user_diet_plan(user_id: str, plan_id: str):
+    """
+    Endpoint to retrieve a single diet plan in full.
+    """
+    try:
+        record = await diet_plan_repository.get(user_id, plan_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving diet plan: {str(e)}"
+        )
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Diet plan not found")
+    return {"status": "success", "data": record}
+
+
+@router.get("/cache/stats", response_model=dict)
+async def get_cache_stats():
+    """
+    Endpoint to report hit, miss and eviction counters for cached diet plans and predictions.
     """
-    # This would normally fetch from MongoDB
-    # For now, return placeholder data
     return {
         "status": "success",
-        "data": {
-            "diet_plans": [
-                {
-                    "id": "sample_diet_plan_id_1",
-                    "created_at": "2025-03-02T09:15:00",
-                    "title": "Low-carb diet plan for weight management"
-                }
-            ]
-        }
-    }
\ No newline at end of file
+        "data": response_cache.stats(namespaces=DIETICIAN_CACHE_NAMESPACES)
+    }
+
+
+@router.delete("/cache", response_model=dict)
+async def invalidate_cache(namespace: Optional[str] = None):
+    """
+    Endpoint to invalidate cached diet plans and predictions.
+
+    - **namespace**: "diet_plan" or "health_predictions"; clears both when omitted.
+      Cache entries owned by other services are never touched.
+    """
+    if namespace is not None and namespace not in DIETICIAN_CACHE_NAMESPACES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"namespace must be one of: {', '.join(DIETICIAN_CACHE_NAMESPACES)}"
+        )
+
+    removed = 0
+    for cache_namespace in ([namespace] if namespace else DIETICIAN_CACHE_NAMESPACES):
+        removed += await response_cache.invalidate(namespace=cache_namespace)
+    return {
+        "status": "success",
+        "data": {"removed": removed}
+    }
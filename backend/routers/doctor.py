@@ -1,9 +1,14 @@
-from fastapi import APIRouter, HTTPException, status, Body
+import json
+
+from fastapi import APIRouter, HTTPException, Query, status, Body
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 
 # Import services
-from services.ai_doctor import process_medical_query, save_medical_query, get_doctor_list
+from services.ai_doctor import process_medical_query, stream_medical_query, save_medical_query, get_doctor_list
+from services.doctor_directory import doctor_directory
+from database.mongodb import medical_query_repository
 
 router = APIRouter()
 
@@ -12,6 +17,7 @@ class MedicalQuery(BaseModel):
     user_id: str
     query: str
     conversation_history: Optional[List[Dict[str, Any]]] = None
+    conversation_id: Optional[str] = None
 
 
 class DoctorReferral(BaseModel):
@@ -34,7 +40,8 @@ async def medical_query(query_data: MedicalQuery):
         response = await process_medical_query(
             query_data.user_id,
             query_data.query,
-            query_data.conversation_history
+            query_data.conversation_history,
+            query_data.conversation_id
         )
 
         # Save to database if query processing was successful
@@ -53,13 +60,43 @@ async def medical_query(query_data: MedicalQuery):
         )
 
 
+@router.post("/query/stream")
+async def medical_query_stream(query_data: MedicalQuery):
+    """
+    Streaming variant of /query using Server-Sent Events.
+
+    - "answer" events carry {"delta": text} as the answer is generated
+    - A final "result" event carries the same payload /query returns, including suggested_doctors
+    - An "error" event is sent instead if the query fails
+    """
+    async def events():
+        async for event, data in stream_medical_query(
+                query_data.user_id,
+                query_data.query,
+                query_data.conversation_history,
+                query_data.conversation_id
+        ):
+            if event == "result":
+                await save_medical_query(query_data.user_id, query_data.query, data["data"])
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/doctors", response_model=Dict[str, List[Dict[str, Any]]])
-async def list_doctors():
+async def list_doctors(specialty: Optional[str] = None, location: Optional[str] = None):
     """
     Endpoint to retrieve a list of doctors with their specialties and contact information.
+
+    - Optionally filtered by specialty keyword and/or location
     """
     try:
-        doctors = await get_doctor_list()
+        doctors = await get_doctor_list(specialty, location)
         return {"doctors": doctors}
     except Exception as e:
         raise HTTPException(
@@ -68,23 +105,68 @@ async def list_doctors():
         )
 
 
+@router.post("/doctors/reload", response_model=dict)
+async def reload_doctors():
+    """
+    Admin endpoint to reload the doctor directory from disk.
+    """
+    try:
+        count = doctor_directory.reload()
+        return {
+            "status": "success",
+            "data": {"doctors": count, "path": doctor_directory.path}
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error reloading doctor directory: {str(e)}"
+        )
+
+
 @router.get("/user-queries/{user_id}", response_model=dict)
-async def get_user_queries(user_id: str):
+async def get_user_queries(
+        user_id: str,
+        limit: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = None
+):
     """
-    Endpoint to retrieve a user's previous medical queries and responses.
+    Endpoint to retrieve a user's previous medical queries, newest first, one page at a time.
+
+    - **limit**: Maximum number of medical queries per page (1-100, default: 20)
+    - **cursor**: The next_cursor value from the previous page
     """
-    # This would normally fetch from MongoDB
-    # For now, return placeholder data
-    return {
-        "status": "success",
-        "data": {
-            "queries": [
-                {
-                    "id": "sample_query_id_1",
-                    "timestamp": "2025-03-05T14:22:00",
-                    "query": "What could cause persistent headaches?",
-                    "response_summary": "Discussed potential causes of headaches and recommended consultation."
-                }
-            ]
+    try:
+        page = await medical_query_repository.list(user_id, limit=limit, cursor=cursor)
+        return {
+            "status": "success",
+            "data": {
+                "queries": page["items"],
+                "next_cursor": page["next_cursor"]
+            }
         }
-    }
\ No newline at end of file
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving medical queries: {str(e)}"
+        )
+
+
+@router.get("/user-queries/{user_id}/{query_id}", response_model=dict)
+async def get_user_query(user_id: str, query_id: str):
+    """
+    Endpoint to retrieve a single medical query in full.
+    """
+    try:
+        record = await medical_query_repository.get(user_id, query_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving medical query: {str(e)}"
+        )
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Medical query not found")
+    return {"status": "success", "data": record}
@@ -1,14 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Body, Form
+from fastapi import (
+    APIRouter, Depends, HTTPException, UploadFile, File, Body, Form, Query, WebSocket, WebSocketDisconnect
+)
 from fastapi.responses import JSONResponse
 from typing import Optional, Dict, Any, List
 import cv2
 import numpy as np
+import json
 import asyncio
 import base64
+import tempfile
 from datetime import datetime
 import os
 
-from services.ai_gymtrainer import gym_trainer_service
+from services.gym_sessions import session_manager
+from services.pose_pool import PosePoolExhausted
+from services.vision_executor import VisionBackpressure
+from services.ai_gymtrainer import GYM_SUMMARY_MAX_POINTS
+from services.exercise_rules import exercise_registry
+from services.series_codec import SUMMARY_MODES, SUMMARY_ENCODINGS
+from services.upload_spool import spool_upload
+from services.video_analysis import (
+    analyze_video, video_executor, VIDEO_FRAME_STRIDE, VIDEO_MOTION_THRESHOLD
+)
 from database.mongodb import get_user_exercise_history
 
 router = APIRouter()
@@ -18,7 +31,8 @@ router = APIRouter()
 async def process_exercise_frame(
         file: UploadFile = File(...),
         user_id: str = Form(...),
-        exercise_choice: int = Form(...)
+        exercise_choice: int = Form(...),
+        session_id: Optional[str] = Form(None)
 ):
     """
     Process a single video frame for exercise recognition.
@@ -26,6 +40,7 @@ async def process_exercise_frame(
     - **file**: The video frame as an image file
     - **user_id**: Unique identifier for the user
     - **exercise_choice**: 1=Squat, 2=Curl, 3=Sit-up, 4=Lunge, 5=Pushup
+    - **session_id**: Optional identifier to run several sessions for one user
     """
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="Invalid file type. Only images are accepted.")
@@ -34,33 +49,183 @@ async def process_exercise_frame(
     contents = await file.read()
 
     try:
-        # Process the frame using our gym trainer service
-        response = await gym_trainer_service.process_frame(contents, user_id, exercise_choice)
+        # Process the frame with this session's own tracker
+        session = session_manager.get_or_create(user_id, session_id, exercise_choice)
+        async with session.lock:
+            response = await session.tracker.process_frame(contents, session.key, exercise_choice)
         return response
+    except (PosePoolExhausted, VisionBackpressure) as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing frame: {str(e)}")
 
 
+@router.websocket("/ws/{user_id}")
+async def stream_exercise_frames(
+        websocket: WebSocket,
+        user_id: str,
+        exercise_choice: int = 1,
+        session_id: Optional[str] = None
+):
+    """
+    Stream video frames over one WebSocket for continuous exercise recognition.
+
+    - Binary messages are encoded image frames
+    - Text messages are JSON controls, e.g. {"exercise_choice": 2}
+    - Each processed frame is answered with the same JSON as /process-frame
+
+    Only the newest frame is kept while inference is busy; older ones are
+    dropped and counted in "dropped_frames" so results never lag behind.
+    """
+    await websocket.accept()
+    if exercise_choice not in exercise_registry:
+        await websocket.send_json({"error": "Unknown exercise_choice, see /exercises"})
+        await websocket.close(code=1008)
+        return
+    session = session_manager.get_or_create(user_id, session_id, exercise_choice)
+
+    stream = {"frame": None, "exercise_choice": exercise_choice, "dropped": 0}
+    frame_ready = asyncio.Event()
+
+    async def receive_frames():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                if stream["frame"] is not None:
+                    stream["dropped"] += 1
+                stream["frame"] = message["bytes"]
+                frame_ready.set()
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                    choice = int(control.get("exercise_choice", stream["exercise_choice"]))
+                except (ValueError, TypeError, AttributeError):
+                    await websocket.send_json({"error": "Invalid control message"})
+                    continue
+                if choice not in exercise_registry:
+                    await websocket.send_json({"error": "Unknown exercise_choice, see /exercises"})
+                    continue
+                stream["exercise_choice"] = choice
+
+    async def process_frames():
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            frame, stream["frame"] = stream["frame"], None
+            if frame is None:
+                continue
+
+            session.touch()
+            try:
+                async with session.lock:
+                    response = await session.tracker.process_frame(frame, session.key, stream["exercise_choice"])
+                response["dropped_frames"] = stream["dropped"]
+            except (PosePoolExhausted, VisionBackpressure) as e:
+                response = {"error": str(e), "retryable": True}
+            except Exception as e:
+                response = {"error": f"Error processing frame: {str(e)}"}
+            await websocket.send_json(response)
+
+    receiver = asyncio.create_task(receive_frames())
+    processor = asyncio.create_task(process_frames())
+    try:
+        # A crash in either task, or a clean disconnect, ends the stream
+        await asyncio.wait({receiver, processor}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        receiver.cancel()
+        processor.cancel()
+        # Retrieve both outcomes so failures are logged rather than lost
+        await asyncio.wait({receiver, processor})
+        for name, task in (("receiver", receiver), ("processor", processor)):
+            error = None if task.cancelled() else task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                print(f"Frame stream {name} for {session.key} failed: {type(error).__name__}: {str(error)}")
+    # The session stays registered; /end-session or the TTL sweeper closes it
+
+
+@router.post("/analyze-video")
+async def analyze_exercise_video(
+        file: UploadFile = File(...),
+        exercise_choice: int = Form(...),
+        frame_stride: int = Form(VIDEO_FRAME_STRIDE),
+        motion_threshold: float = Form(VIDEO_MOTION_THRESHOLD)
+):
+    """
+    Analyze a recorded workout video and count reps offline.
+
+    - **file**: The workout recording
+    - **exercise_choice**: 1=Squat, 2=Curl, 3=Sit-up, 4=Lunge, 5=Pushup
+    - **frame_stride**: Analyse every Nth frame
+    - **motion_threshold**: Skip frames that barely changed since the last analysed one (0 disables)
+    """
+    if not file.content_type.startswith('video/'):
+        raise HTTPException(status_code=400, detail="Invalid file type. Only videos are accepted.")
+    if exercise_choice not in exercise_registry:
+        raise HTTPException(status_code=400, detail="Unknown exercise_choice, see /exercises")
+
+    # Spool the upload to disk in chunks so OpenCV can stream it from a file
+    suffix = os.path.splitext(file.filename or "")[1] or ".mp4"
+    descriptor, path = tempfile.mkstemp(suffix=suffix)
+    os.close(descriptor)
+
+    try:
+        await spool_upload(file, path)
+    except Exception as e:
+        os.unlink(path)
+        raise HTTPException(status_code=500, detail=f"Error receiving video: {str(e)}")
+
+    # The worker keeps reading the file if the client goes away, so the job is
+    # shielded from cancellation and the file is removed only once it finishes
+    analysis = asyncio.ensure_future(video_executor.run(
+        f"video:{os.path.basename(path)}", analyze_video,
+        path, exercise_choice, frame_stride, motion_threshold
+    ))
+    analysis.add_done_callback(lambda job: _remove_spool(job, path))
+    try:
+        return await asyncio.shield(analysis)
+    except VisionBackpressure as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing video: {str(e)}")
+
+
+def _remove_spool(job, path):
+    # Retrieve the outcome so an abandoned job's error is not reported as unhandled
+    if not job.cancelled():
+        job.exception()
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
 @router.post("/start-session")
 async def start_exercise_session(
         user_id: str = Body(...),
-        exercise_choice: Optional[int] = Body(1)
+        exercise_choice: Optional[int] = Body(1),
+        session_id: Optional[str] = Body(None)
 ):
     """
     Start a new exercise tracking session.
 
     - **user_id**: Unique identifier for the user
     - **exercise_choice**: 1=Squat, 2=Curl, 3=Sit-up, 4=Lunge, 5=Pushup (default: 1)
+    - **session_id**: Optional identifier to run several sessions for one user
     """
     try:
-        # Reset the exercise tracking state
-        gym_trainer_service.reset_variables()
+        # Replace only this user's session; other trainees are unaffected
+        session = session_manager.start(user_id, session_id, exercise_choice)
 
         return {
             "message": "Exercise session started",
-            "exercise": ['', 'Squat', 'Curl', 'Sit-up', 'Lunge', 'Pushup'][exercise_choice],
+            "exercise": exercise_registry.label(exercise_choice),
             "user_id": user_id,
-            "timestamp": datetime.now().isoformat()
+            "session_id": session.session_id,
+            "timestamp": session.started_at
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error starting session: {str(e)}")
@@ -68,43 +233,92 @@ async def start_exercise_session(
 
 @router.post("/end-session")
 async def end_exercise_session(
-        user_id: str = Body(...)
+        user_id: str = Body(...),
+        session_id: Optional[str] = Body(None),
+        summary_mode: str = Body("lttb"),
+        summary_encoding: str = Body("json"),
+        max_points: int = Body(GYM_SUMMARY_MAX_POINTS)
 ):
     """
     End the current exercise session and save the data.
 
     - **user_id**: Unique identifier for the user
+    - **session_id**: Optional identifier of the session to end
+    - **summary_mode**: Angle chart detail: "stride", "minmax" or "lttb" (default: "lttb")
+    - **summary_encoding**: "json" lists or "binary" base64 delta-encoded int16 series
+    - **max_points**: Points (or min/max buckets) per angle series
     """
+    if summary_mode not in SUMMARY_MODES or summary_encoding not in SUMMARY_ENCODINGS:
+        raise HTTPException(status_code=400, detail="Invalid summary_mode or summary_encoding")
+
+    session = session_manager.end(user_id, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="No active exercise session for this user")
+
     try:
         # Save the exercise data to the database
-        summary = await gym_trainer_service.save_exercise_data(user_id, None)
-
-        # Reset the state for the next session
-        gym_trainer_service.reset_variables()
+        async with session.lock:
+            summary = await session.tracker.save_exercise_data(
+                user_id, None, session.exercise_choice,
+                max_points=max_points, mode=summary_mode, encoding=summary_encoding
+            )
 
         return {
             "message": "Exercise session completed",
             "summary": summary,
             "user_id": user_id,
+            "session_id": session.session_id,
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error ending session: {str(e)}")
 
 
+@router.delete("/sessions")
+async def evict_exercise_sessions(user_id: Optional[str] = None):
+    """
+    Evict active exercise sessions without saving them.
+
+    - **user_id**: Only evict this user's sessions; evicts every session when omitted
+    """
+    evicted = session_manager.evict(user_id)
+    return {"evicted": evicted, "active_sessions": len(session_manager)}
+
+
 @router.get("/history/{user_id}")
-async def get_exercise_history(user_id: str):
+async def get_exercise_history(
+        user_id: str,
+        limit: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        fields: Optional[str] = None
+):
     """
-    Get the exercise history for a specific user.
+    Get the exercise history for a specific user, newest first, one page at a time.
 
     - **user_id**: Unique identifier for the user
+    - **limit**: Maximum number of records per page (1-100, default: 20)
+    - **cursor**: The next_cursor value from the previous page
+    - **start_date** / **end_date**: Only include records within this range
+    - **fields**: Comma-separated record fields to return
     """
     try:
-        exercise_history = await get_user_exercise_history(user_id)
+        page = await get_user_exercise_history(
+            user_id,
+            limit=limit,
+            cursor=cursor,
+            start=start_date.isoformat() if start_date else None,
+            end=end_date.isoformat() if end_date else None,
+            fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else None
+        )
         return {
             "user_id": user_id,
-            "history": exercise_history
+            "history": page["items"],
+            "next_cursor": page["next_cursor"]
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving exercise history: {str(e)}")
 
@@ -113,10 +327,7 @@ async def get_exercise_history(user_id: str):
 async def get_available_exercises():
     """Get a list of available exercises."""
     exercises = [
-        {"id": 1, "name": "Squat", "target_muscles": ["Quadriceps", "Glutes", "Hamstrings"]},
-        {"id": 2, "name": "Arm Curl", "target_muscles": ["Biceps", "Forearms"]},
-        {"id": 3, "name": "Sit-up", "target_muscles": ["Core", "Abdominal Muscles"]},
-        {"id": 4, "name": "Lunge", "target_muscles": ["Quadriceps", "Glutes", "Calves"]},
-        {"id": 5, "name": "Push-up", "target_muscles": ["Chest", "Triceps", "Core"]}
+        {"id": exercise.id, "name": exercise.display_name, "target_muscles": exercise.muscles}
+        for exercise in exercise_registry.all()
     ]
     return {"exercises": exercises}
\ No newline at end of file
@@ -1,67 +1,234 @@
-import os
 import base64
+import hashlib
 import json
+import asyncio
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from database.mongodb import patient_record_repository
+from database.repository import preview_text
+from services.llm_client import llm_client
+from services.report_image import normalize_report_image
+from services.report_pdf import PdfReport, is_pdf, REPORT_PDF_MAX_PAGES, REPORT_PDF_CONCURRENCY
+from services.response_cache import response_cache, make_cache_key
 
 # Load environment variables
 load_dotenv()
 
-# OpenAI API configuration
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Bump when the analysis prompt changes so cached analyses are not reused
+REPORT_ANALYSIS_PROMPT_VERSION = "1"
+
+
+# Prompt sent with every report page
+REPORT_ANALYSIS_PROMPT = """
+Please analyze this medical report/prescription and provide the following information:
+1. A clear summary of the report in simple language
+2. List all medications mentioned with their dosages, frequencies, and purposes
+3. Highlight any specific recommendations or instructions for the patient
+4. Note any concerns or potential issues the patient should be aware of
+
+Format your response as a structured JSON with the following fields:
+- summary: A concise overview of the report
+- medications: An array of medication objects with name, dosage, frequency, and purpose
+- recommendations: Specific actions or follow-ups the patient should take
+- concerns: Any warnings or potential issues to be aware of
+"""
 
 
-async def analyze_medical_report(image_data):
+def report_cache_key(digest, user_id=None):
     """
-    Analyze medical reports and prescriptions using OpenAI's GPT-4o.
+    Build the cache key for the analysis of one exact page image.
+
+    Keys are scoped to the uploading user so analyses are never served
+    across patients. The user ID is hashed because cache-key normalization
+    case-folds strings.
+    """
+    owner = hashlib.sha256(user_id.encode("utf-8")).hexdigest() if user_id else None
+    return make_cache_key(
+        "report_analysis", {"digest": digest, "owner": owner}, REPORT_ANALYSIS_PROMPT_VERSION
+    )
+
+
+async def analyze_report_image(image_data, user_id=None):
+    """
+    Analyze one report image, reusing the cached analysis of an identical page.
 
     Args:
-        image_data: The medical report or prescription image data
+        image_data: Raw image bytes
+        user_id: The ID of the uploading user; cached analyses are only reused for them
 
     Returns:
-        dict: Analysis results including summary, medications, and recommendations
+        tuple: (analysis dict, whether it came from the cache)
+    """
+    # Detect the real format, shrink to the model's working size and digest the page off the event loop
+    loop = asyncio.get_running_loop()
+    image = await loop.run_in_executor(None, normalize_report_image, image_data)
+
+    # Exact re-uploads of the same page by the same user reuse the earlier analysis
+    cache_key = report_cache_key(image["digest"], user_id)
+    cached = await response_cache.get(cache_key, namespace="report_analysis")
+    if cached is not None:
+        return cached, True
+
+    # Convert image data to base64 for OpenAI API
+    base64_image = base64.b64encode(image["data"]).decode('utf-8')
+
+    # Call the OpenAI API with the image and prompt, then parse the JSON response
+    analysis_result = await llm_client.chat_json([
+        {"role": "system",
+         "content": "You are a medical assistant that analyzes medical reports and prescriptions."},
+        {"role": "user", "content": [
+            {"type": "text", "text": REPORT_ANALYSIS_PROMPT},
+            {"type": "image_url", "image_url": {"url": f"data:{image['mime_type']};base64,{base64_image}"}}
+        ]}
+    ])
+    await response_cache.set(cache_key, analysis_result, namespace="report_analysis")
+    return analysis_result, False
+
+
+def _merge_text(values):
+    # Flatten strings and lists of strings, dropping empty and repeated entries
+    seen = []
+    for value in values:
+        items = value if isinstance(value, list) else [value]
+        for item in items:
+            text = item.strip() if isinstance(item, str) else (json.dumps(item) if item else "")
+            if text and text not in seen:
+                seen.append(text)
+    return "\n".join(seen)
+
+
+def _medication_key(medication):
+    if not isinstance(medication, dict):
+        return " ".join(str(medication).split()).casefold()
+    name = " ".join(str(medication.get("name") or "").split()).casefold()
+    dosage = "".join(str(medication.get("dosage") or "").split()).casefold()
+    return f"{name}|{dosage}"
+
+
+def merge_page_analyses(analyses):
+    """
+    Merge per-page analyses into one report analysis.
+
+    Summaries are labelled by page, recommendations and concerns are
+    combined without repeats, and a medication listed on several pages
+    (same name and dosage) appears once with any missing fields filled in
+    from the other pages.
+
+    Args:
+        analyses: List of (page number, analysis dict)
+
+    Returns:
+        dict: Combined summary, medications, recommendations and concerns
     """
+    medications = {}
+    for _, analysis in analyses:
+        for medication in analysis.get("medications") or []:
+            key = _medication_key(medication)
+            if key not in medications:
+                medications[key] = dict(medication) if isinstance(medication, dict) else medication
+            elif isinstance(medication, dict):
+                for field, value in medication.items():
+                    if value and not medications[key].get(field):
+                        medications[key][field] = value
+
+    if len(analyses) == 1:
+        summary = analyses[0][1].get("summary", "")
+    else:
+        summary = "\n".join(
+            f"Page {page}: {analysis['summary']}" for page, analysis in analyses if analysis.get("summary")
+        )
+
+    return {
+        "summary": summary,
+        "medications": list(medications.values()),
+        "recommendations": _merge_text(analysis.get("recommendations") for _, analysis in analyses),
+        "concerns": _merge_text(analysis.get("concerns") for _, analysis in analyses)
+    }
+
+
+async def analyze_pdf_report(pdf_data, user_id=None):
+    """
+    Analyze a multi-page PDF report page by page and merge the results.
+
+    Pages are rasterized only when a worker slot frees up, and at most
+    REPORT_PDF_CONCURRENCY pages are rendered or being analyzed at once.
+    Each page is cached under the digest of its own rendered image and the
+    uploading user, so pages sharing a template never reuse each other's
+    analysis.
+
+    Args:
+        pdf_data: Raw PDF bytes
+        user_id: The ID of the uploading user
+
+    Returns:
+        dict: Merged analysis plus page counts; failed pages are listed in failed_pages
+    """
+    loop = asyncio.get_running_loop()
+    document = await loop.run_in_executor(None, PdfReport, pdf_data)
+    slots = asyncio.Semaphore(REPORT_PDF_CONCURRENCY)
+    render_lock = asyncio.Lock()
+    total_pages = document.page_count
+    page_count = min(total_pages, REPORT_PDF_MAX_PAGES)
+
+    async def analyze_page(index):
+        async with slots:
+            # One document handle, so pages are rendered one at a time
+            async with render_lock:
+                page_image = await loop.run_in_executor(None, document.render, index)
+            analysis, _ = await analyze_report_image(page_image, user_id)
+            return analysis
+
     try:
-        # Convert image data to base64 for OpenAI API
-        base64_image = base64.b64encode(image_data).decode('utf-8')
-
-        # Construct the prompt for GPT-4o
-        prompt = """
-        Please analyze this medical report/prescription and provide the following information:
-        1. A clear summary of the report in simple language
-        2. List all medications mentioned with their dosages, frequencies, and purposes
-        3. Highlight any specific recommendations or instructions for the patient
-        4. Note any concerns or potential issues the patient should be aware of
-
-        Format your response as a structured JSON with the following fields:
-        - summary: A concise overview of the report
-        - medications: An array of medication objects with name, dosage, frequency, and purpose
-        - recommendations: Specific actions or follow-ups the patient should take
-        - concerns: Any warnings or potential issues to be aware of
-        """
-
-        # Call the OpenAI API with the image and prompt
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system",
-                 "content": "You are a medical assistant that analyzes medical reports and prescriptions."},
-                {"role": "user", "content": [
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                ]}
-            ],
-            response_format={"type": "json_object"}
+        results = await asyncio.gather(
+            *(analyze_page(index) for index in range(page_count)),
+            return_exceptions=True
         )
+    finally:
+        document.close()
 
-        # Extract and parse the JSON response
-        analysis_result = json.loads(response.choices[0].message.content)
+    analyses = [(index + 1, result) for index, result in enumerate(results) if isinstance(result, dict)]
+    failed_pages = [index + 1 for index, result in enumerate(results) if not isinstance(result, dict)]
+    for page in failed_pages:
+        print(f"Error analyzing PDF page {page}: {str(results[page - 1])}")
+    if not analyses:
+        raise ValueError(f"No page of the PDF could be analyzed: {str(results[0]) if results else 'empty document'}")
 
-        return {
+    merged = merge_page_analyses(analyses)
+    merged["pages"] = {
+        "total": total_pages,
+        "analyzed": len(analyses),
+        "failed_pages": failed_pages,
+        "truncated": total_pages > page_count
+    }
+    return merged
+
+
+async def analyze_medical_report(image_data, user_id=None):
+    """
+    Analyze medical reports and prescriptions using OpenAI's GPT-4o.
+
+    Args:
+        image_data: The medical report or prescription as image or PDF data
+        user_id: The ID of the uploading user, used to scope cached analyses
+
+    Returns:
+        dict: Analysis results including summary, medications, and recommendations
+    """
+    try:
+        if is_pdf(image_data):
+            return {
+                "status": "success",
+                "data": await analyze_pdf_report(image_data, user_id)
+            }
+
+        analysis_result, cached = await analyze_report_image(image_data, user_id)
+        response = {
             "status": "success",
             "data": analysis_result
         }
+        if cached:
+            response["cached"] = True
+        return response
     except Exception as e:
         return {
             "status": "error",
@@ -81,6 +248,11 @@ async def save_analysis_to_db(user_id, report_data, analysis_result):
     Returns:
         str: The ID of the saved record
     """
-    # In a real implementation, this would interact with your MongoDB
-    # For now, we'll return a placeholder
-    return "report_analysis_id_placeholder"
\ No newline at end of file
+    return await patient_record_repository.save(user_id, {
+        "filename": report_data.get("filename"),
+        "content_type": report_data.get("content_type"),
+        "size": report_data.get("size"),
+        "summary": preview_text(analysis_result.get("summary")),
+        "medication_count": len(analysis_result.get("medications") or []),
+        "analysis": analysis_result
+    })
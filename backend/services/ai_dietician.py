@@ -1,14 +1,34 @@
-import os
 import json
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from database.mongodb import diet_plan_repository
+from database.repository import preview_text
+from services.llm_client import llm_client
+from services.response_cache import response_cache, make_cache_key
 
 # Load environment variables
 load_dotenv()
 
-# OpenAI API configuration
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Bump a version whenever its prompt changes so stale cached responses are ignored
+DIET_PLAN_PROMPT_VERSION = "1"
+HEALTH_PREDICTION_PROMPT_VERSION = "1"
+
+# Response cache namespaces owned by the dietician
+DIETICIAN_CACHE_NAMESPACES = ("diet_plan", "health_predictions")
+
+# Profile fields that feed each prompt; nothing else affects the response
+DIET_PLAN_FIELDS = (
+    "age", "sex", "weight", "height", "health_issues", "sleep_hours",
+    "activity_level", "dietary_preferences", "allergies"
+)
+HEALTH_PREDICTION_FIELDS = (
+    "age", "sex", "weight", "height", "health_issues", "sleep_hours",
+    "activity_level", "family_history", "current_medications", "daily_routine"
+)
+
+
+def _profile_cache_key(namespace, user_data, fields, prompt_version):
+    return make_cache_key(namespace, {field: user_data.get(field) for field in fields}, prompt_version)
 
 
 async def generate_diet_plan(user_data):
@@ -23,6 +43,15 @@ async def generate_diet_plan(user_data):
         dict: Personalized diet plan and lifestyle recommendations
     """
     try:
+        # Identical profiles reuse the cached plan instead of calling GPT-4o again
+        cache_key = _profile_cache_key("diet_plan", user_data, DIET_PLAN_FIELDS, DIET_PLAN_PROMPT_VERSION)
+        cached_plan = await response_cache.get(cache_key, namespace="diet_plan")
+        if cached_plan is not None:
+            return {
+                "status": "success",
+                "data": cached_plan
+            }
+
         # Construct the prompt for GPT-4o
         prompt = f"""
         Generate a personalized diet plan for a {user_data.get('age')}-year-old {user_data.get('sex')} 
@@ -52,18 +81,12 @@ async def generate_diet_plan(user_data):
         - lifestyle_recommendations: array of lifestyle suggestions
         """
 
-        # Call the OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a nutritionist and dietitian assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-
-        # Extract and parse the JSON response
-        diet_plan = json.loads(response.choices[0].message.content)
+        # Call the OpenAI API and parse the JSON response
+        diet_plan = await llm_client.chat_json([
+            {"role": "system", "content": "You are a nutritionist and dietitian assistant."},
+            {"role": "user", "content": prompt}
+        ])
+        await response_cache.set(cache_key, diet_plan, namespace="diet_plan")
 
         return {
             "status": "success",
@@ -87,6 +110,17 @@ async def predict_health_metrics(user_data):
         dict: Predicted health metrics and risk assessments
     """
     try:
+        # Identical profiles reuse the cached predictions instead of calling GPT-4o again
+        cache_key = _profile_cache_key(
+            "health_predictions", user_data, HEALTH_PREDICTION_FIELDS, HEALTH_PREDICTION_PROMPT_VERSION
+        )
+        cached_predictions = await response_cache.get(cache_key, namespace="health_predictions")
+        if cached_predictions is not None:
+            return {
+                "status": "success",
+                "data": cached_predictions
+            }
+
         # Construct the prompt for GPT-4o
         prompt = f"""
         Based on the following health information, provide predictions about potential health metrics 
@@ -114,19 +148,13 @@ async def predict_health_metrics(user_data):
         - disclaimer: clear statement about limitations of these predictions
         """
 
-        # Call the OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system",
-                 "content": "You are a health analytics assistant. Provide health predictions based on statistical averages while clearly stating limitations."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-
-        # Extract and parse the JSON response
-        health_predictions = json.loads(response.choices[0].message.content)
+        # Call the OpenAI API and parse the JSON response
+        health_predictions = await llm_client.chat_json([
+            {"role": "system",
+             "content": "You are a health analytics assistant. Provide health predictions based on statistical averages while clearly stating limitations."},
+            {"role": "user", "content": prompt}
+        ])
+        await response_cache.set(cache_key, health_predictions, namespace="health_predictions")
 
         return {
             "status": "success",
@@ -150,6 +178,10 @@ async def save_diet_plan(user_id, diet_plan):
     Returns:
         str: The ID of the saved diet plan
     """
-    # In a real implementation, this would save to MongoDB
-    # For now, we'll return a placeholder
-    return "diet_plan_id_placeholder"
\ No newline at end of file
+    daily_calories = diet_plan.get("daily_calories")
+    title = diet_plan.get("title") or (f"{daily_calories} kcal diet plan" if daily_calories else "Diet plan")
+    return await diet_plan_repository.save(user_id, {
+        "title": preview_text(title),
+        "daily_calories": daily_calories,
+        "plan": diet_plan
+    })
@@ -1,5 +1,5 @@
+import os
 import mediapipe as mp
-import cv2
 import numpy as np
 import matplotlib.pyplot as plt
 import time
@@ -8,237 +8,71 @@ from datetime import datetime
 import json
 from typing import Dict, List, Any, Optional
 
-mp_drawing = mp.solutions.drawing_utils
-mp_pose = mp.solutions.pose
+from services.vision_executor import vision_executor
+from services.pose_angles import joint_angles
+from services.exercise_rules import exercise_registry
+from services.ring_buffer import RingBuffer
+from services.series_codec import align_series, summarize_series
+
+# Angle history configuration
+GYM_ANGLE_WINDOW = int(os.getenv("GYM_ANGLE_WINDOW", "3600"))
+GYM_SUMMARY_MAX_POINTS = int(os.getenv("GYM_SUMMARY_MAX_POINTS", "500"))
+GYM_ANGLE_SPILL = os.getenv("GYM_ANGLE_SPILL", "false").lower() == "true"
+# Spilled chunks must fit in the window, or values would be overwritten before being written
+GYM_ANGLE_SPILL_CHUNK = min(int(os.getenv("GYM_ANGLE_SPILL_CHUNK", "600")), GYM_ANGLE_WINDOW)
 
+ANGLE_SERIES = ("left", "right", "body", "frames")
 
-def calc_angle(x, y, z):
-    """Calculate angle between three points."""
-    x = np.array(x)
-    y = np.array(y)
-    z = np.array(z)
-    radians = np.arctan2(z[1] - y[1], z[0] - y[0]) - np.arctan2(x[1] - y[1], x[0] - y[0])
-    angle = np.abs(radians * 180.0 / np.pi)
-    if angle > 180.0:
-        angle = 360 - angle
-    return angle
+mp_drawing = mp.solutions.drawing_utils
+mp_pose = mp.solutions.pose
 
 
 class GymTrainerService:
-    def __init__(self):
+    def __init__(self, session_key=None, angle_window=GYM_ANGLE_WINDOW):
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_pose = mp.solutions.pose
+        self.session_key = session_key
+        self.angle_window = angle_window
         self.reset_variables()
 
     def reset_variables(self):
         """Reset all tracking variables."""
-        self.exercise_counters = [0, 0, 0, 0, 0, 0]
-        self.state = "Up"
+        self.exercise_counters = [0] * (max((e.id for e in exercise_registry.all()), default=0) + 1)
+        self.state = exercise_registry.initial_state
         self.feedback = ""
-        self.range_flag = True
-        self.halfway = False
-        self.left_angle = []
-        self.right_angle = []
-        self.body_angles = []
-        self.frames = []
+        # Flags shared by the exercise rules, e.g. range_flag and halfway
+        for flag, value in exercise_registry.flags.items():
+            setattr(self, flag, value)
+        # Bounded histories: only the most recent angle_window frames are kept
+        self.left_angle = RingBuffer(self.angle_window)
+        self.right_angle = RingBuffer(self.angle_window)
+        self.body_angles = RingBuffer(self.angle_window)
+        self.frames = RingBuffer(self.angle_window, typecode="l")
+        # Frame index of every value in each angle series, which only cover frames of their exercises
+        self.series_frames = {
+            name: RingBuffer(self.angle_window, typecode="l") for name in ANGLE_SERIES if name != "frames"
+        }
         self.frame_count = 0
-
-    def recognise_squat(self, detection):
-        """Recognize squat exercise."""
-        try:
-            landmarks = detection.pose_landmarks.landmark
-            left_hip = [landmarks[self.mp_pose.PoseLandmark.LEFT_HIP.value].x,
-                        landmarks[self.mp_pose.PoseLandmark.LEFT_HIP.value].y]
-            left_knee = [landmarks[self.mp_pose.PoseLandmark.LEFT_KNEE.value].x,
-                         landmarks[self.mp_pose.PoseLandmark.LEFT_KNEE.value].y]
-            left_heel = [landmarks[self.mp_pose.PoseLandmark.LEFT_HEEL.value].x,
-                         landmarks[self.mp_pose.PoseLandmark.LEFT_HEEL.value].y]
-            right_hip = [landmarks[self.mp_pose.PoseLandmark.RIGHT_HIP.value].x,
-                         landmarks[self.mp_pose.PoseLandmark.RIGHT_HIP.value].y]
-            right_knee = [landmarks[self.mp_pose.PoseLandmark.RIGHT_KNEE.value].x,
-                          landmarks[self.mp_pose.PoseLandmark.RIGHT_KNEE.value].y]
-            right_heel = [landmarks[self.mp_pose.PoseLandmark.RIGHT_HEEL.value].x,
-                          landmarks[self.mp_pose.PoseLandmark.RIGHT_HEEL.value].y]
-            left_shoulder = [landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                             landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-            right_shoulder = [landmarks[self.mp_pose.PoseLandmark.RIGHT_SHOULDER.value].x,
-                              landmarks[self.mp_pose.PoseLandmark.RIGHT_SHOULDER.value].y]
-            left = calc_angle(left_hip, left_knee, left_heel)
-            right = calc_angle(right_hip, right_knee, right_heel)
-            self.left_angle.append(int(left))
-            self.right_angle.append(int(right))
-            shoulder_dist = left_shoulder[0] - right_shoulder[0]
-            knee_dist = left_knee[0] - right_knee[0]
-            if shoulder_dist - knee_dist > 0.04:
-                self.feedback = 'Open up your knees further apart to shoulder width!'
-            else:
-                self.feedback = ''
-            if left > 170 and right > 170:
-                self.state = "Up"
-            if left < 165 and right < 165:
-                self.feedback = 'Almost there... lower until height of hips!'
-            if left < 140 and right < 140 and self.state == "Up":
-                self.state = "Down"
-                self.exercise_counters[1] += 1
-            if self.state == "Down":
-                self.feedback = 'Good rep!'
-        except:
-            self.left_angle.append(180)
-            self.right_angle.append(180)
-
-    def recognise_curl(self, detection):
-        """Recognize arm curl exercise."""
-        try:
-            landmarks = detection.pose_landmarks.landmark
-            left_wrist = [landmarks[self.mp_pose.PoseLandmark.LEFT_WRIST.value].x,
-                          landmarks[self.mp_pose.PoseLandmark.LEFT_WRIST.value].y]
-            left_shoulder = [landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                             landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-            left_elbow = [landmarks[self.mp_pose.PoseLandmark.LEFT_ELBOW.value].x,
-                          landmarks[self.mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-            right_wrist = [landmarks[self.mp_pose.PoseLandmark.RIGHT_WRIST.value].x,
-                           landmarks[self.mp_pose.PoseLandmark.RIGHT_WRIST.value].y]
-            right_shoulder = [landmarks[self.mp_pose.PoseLandmark.RIGHT_SHOULDER.value].x,
-                              landmarks[self.mp_pose.PoseLandmark.RIGHT_SHOULDER.value].y]
-            right_elbow = [landmarks[self.mp_pose.PoseLandmark.RIGHT_ELBOW.value].x,
-                           landmarks[self.mp_pose.PoseLandmark.RIGHT_ELBOW.value].y]
-            left_elbow_angle = calc_angle(left_shoulder, left_elbow, left_wrist)
-            right_elbow_angle = calc_angle(right_shoulder, right_elbow, right_wrist)
-            self.left_angle.append(int(left_elbow_angle))
-            self.right_angle.append(int(right_elbow_angle))
-            if left_elbow_angle > 160 and right_elbow_angle > 160:
-                if not self.range_flag:
-                    self.feedback = 'Did not curl completely.'
-                else:
-                    self.feedback = 'Good rep!'
-                self.state = 'Down'
-            elif (left_elbow_angle > 50 and right_elbow_angle > 50) and self.state == 'Down':
-                self.range_flag = False
-                self.feedback = ''
-            elif (left_elbow_angle < 30 and right_elbow_angle < 30) and self.state == 'Down':
-                self.state = 'Up'
-                self.feedback = ''
-                self.range_flag = True
-                self.exercise_counters[2] += 1
-        except:
-            self.left_angle.append(180)
-            self.right_angle.append(180)
-
-    def recognise_situp(self, detection):
-        """Recognize sit-up exercise."""
-        try:
-            landmarks = detection.pose_landmarks.landmark
-            left_hip = [landmarks[self.mp_pose.PoseLandmark.LEFT_HIP.value].x,
-                        landmarks[self.mp_pose.PoseLandmark.LEFT_HIP.value].y]
-            left_knee = [landmarks[self.mp_pose.PoseLandmark.LEFT_KNEE.value].x,
-                         landmarks[self.mp_pose.PoseLandmark.LEFT_KNEE.value].y]
-            left_heel = [landmarks[self.mp_pose.PoseLandmark.LEFT_HEEL.value].x,
-                         landmarks[self.mp_pose.PoseLandmark.LEFT_HEEL.value].y]
-            left_shoulder = [landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                             landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-            angle_knee = calc_angle(left_hip, left_knee, left_heel)
-            angle_body = calc_angle(left_shoulder, left_hip, left_knee)
-            self.body_angles.append(int(angle_body))
-            if (angle_body < 80 and angle_body > 50) and self.state == "Down":
-                self.halfway = True
-            if angle_body < 40 and self.state == "Down":
-                self.state = "Up"
-                self.range_flag = True
-            if angle_body > 90 and angle_knee < 60:
-                self.state = "Down"
-                if self.halfway:
-                    if self.range_flag:
-                        self.exercise_counters[3] += 1
-                        self.feedback = "Good repetition!"
-                    else:
-                        self.feedback = "Did not perform sit up completely."
-                    self.range_flag = False
-                    self.halfway = False
-            if angle_knee > 70:
-                self.feedback = "Keep legs tucked in closer"
-        except:
-            self.body_angles.append(180)
-
-    def recognise_lunge(self, detection):
-        """Recognize lunge exercise."""
-        try:
-            landmarks = detection.pose_landmarks.landmark
-            left_hip = [landmarks[self.mp_pose.PoseLandmark.LEFT_HIP.value].x,
-                        landmarks[self.mp_pose.PoseLandmark.LEFT_HIP.value].y]
-            left_knee = [landmarks[self.mp_pose.PoseLandmark.LEFT_KNEE.value].x,
-                         landmarks[self.mp_pose.PoseLandmark.LEFT_KNEE.value].y]
-            left_ankle = [landmarks[self.mp_pose.PoseLandmark.LEFT_ANKLE.value].x,
-                          landmarks[self.mp_pose.PoseLandmark.LEFT_ANKLE.value].y]
-            right_hip = [landmarks[self.mp_pose.PoseLandmark.RIGHT_HIP.value].x,
-                         landmarks[self.mp_pose.PoseLandmark.RIGHT_HIP.value].y]
-            right_knee = [landmarks[self.mp_pose.PoseLandmark.RIGHT_KNEE.value].x,
-                          landmarks[self.mp_pose.PoseLandmark.RIGHT_KNEE.value].y]
-            right_ankle = [landmarks[self.mp_pose.PoseLandmark.RIGHT_ANKLE.value].x,
-                           landmarks[self.mp_pose.PoseLandmark.RIGHT_ANKLE.value].y]
-
-            left_lunge_angle = calc_angle(left_hip, left_knee, left_ankle)
-            right_lunge_angle = calc_angle(right_hip, right_knee, right_ankle)
-
-            self.left_angle.append(int(left_lunge_angle))
-            self.right_angle.append(int(right_lunge_angle))
-
-            if left_lunge_angle > 160 and right_lunge_angle > 160:
-                self.state = "Up"
-                self.feedback = ''
-
-            if (left_lunge_angle < 100 and right_lunge_angle < 100) and self.state == "Up":
-                self.state = "Down"
-                self.exercise_counters[4] += 1
-                self.feedback = "Good lunge!"
-        except:
-            self.left_angle.append(180)
-            self.right_angle.append(180)
-
-    def recognise_pushup(self, detection):
-        """Recognize push-up exercise."""
-        try:
-            landmarks = detection.pose_landmarks.landmark
-            left_shoulder = [landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                             landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-            left_elbow = [landmarks[self.mp_pose.PoseLandmark.LEFT_ELBOW.value].x,
-                          landmarks[self.mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-            left_wrist = [landmarks[self.mp_pose.PoseLandmark.LEFT_WRIST.value].x,
-                          landmarks[self.mp_pose.PoseLandmark.LEFT_WRIST.value].y]
-            right_shoulder = [landmarks[self.mp_pose.PoseLandmark.RIGHT_SHOULDER.value].x,
-                              landmarks[self.mp_pose.PoseLandmark.RIGHT_SHOULDER.value].y]
-            right_elbow = [landmarks[self.mp_pose.PoseLandmark.RIGHT_ELBOW.value].x,
-                           landmarks[self.mp_pose.PoseLandmark.RIGHT_ELBOW.value].y]
-            right_wrist = [landmarks[self.mp_pose.PoseLandmark.RIGHT_WRIST.value].x,
-                           landmarks[self.mp_pose.PoseLandmark.RIGHT_WRIST.value].y]
-
-            left_elbow_angle = calc_angle(left_shoulder, left_elbow, left_wrist)
-            right_elbow_angle = calc_angle(right_shoulder, right_elbow, right_wrist)
-
-            self.left_angle.append(int(left_elbow_angle))
-            self.right_angle.append(int(right_elbow_angle))
-
-            if left_elbow_angle > 160 and right_elbow_angle > 160:
-                self.state = "Up"
-                self.feedback = ''
-
-            if (left_elbow_angle < 90 and right_elbow_angle < 90) and self.state == "Up":
-                self.state = "Down"
-                self.exercise_counters[5] += 1
-                self.feedback = "Good pushup!"
-        except:
-            self.left_angle.append(180)
-            self.right_angle.append(180)
-
-    def get_performance_summary(self, exercise_choice=None):
-        """Generate a performance summary."""
-        exercise_labels = ['', 'Squats', 'Arm Curls', 'Sit-ups', 'Lunges', 'Pushups']
+        self.spilled = {name: 0 for name in ANGLE_SERIES}
+        # Frames that ran pose inference vs. reused landmarks under motion gating
+        self.inference_stats = {"inferred": 0, "reused": 0}
+
+    def get_performance_summary(self, exercise_choice=None, max_points=GYM_SUMMARY_MAX_POINTS,
+                                mode="stride", encoding="json"):
+        """
+        Generate a performance summary.
+
+        Angle series are reduced to max_points with the given mode ("stride",
+        "minmax" or "lttb") and encoding ("json" or "binary" delta-int16).
+        """
+        exercises = exercise_registry.all()
         total_reps = sum(self.exercise_counters[1:])
 
         # Build summary data
         summary = {
             "total_reps": total_reps,
             "exercise_counts": {
-                exercise_labels[i]: self.exercise_counters[i] for i in range(1, 6)
+                exercise.summary_label: self.exercise_counters[exercise.id] for exercise in exercises
             },
             "timestamp": datetime.now().isoformat()
         }
@@ -256,97 +90,129 @@ class GymTrainerService:
             summary["overall_feedback"] = "Excellent performance! You're a fitness champion!"
 
         # Add muscle groups worked
-        muscle_groups = {
-            1: ["Quadriceps", "Glutes", "Hamstrings"],
-            2: ["Biceps", "Forearms"],
-            3: ["Core", "Abdominal Muscles"],
-            4: ["Quadriceps", "Glutes", "Calves"],
-            5: ["Chest", "Triceps", "Core"]
-        }
-
         worked_muscles = set()
-        for i in range(1, 6):
-            if self.exercise_counters[i] > 0:
-                worked_muscles.update(muscle_groups[i])
+        for exercise in exercises:
+            if self.exercise_counters[exercise.id] > 0:
+                worked_muscles.update(exercise.muscles)
 
         summary["muscles_worked"] = list(worked_muscles)
-
-        # Add exercise-specific data if requested
-        if exercise_choice and 1 <= exercise_choice <= 5:
-            if exercise_choice in [1, 2, 4, 5]:
-                summary["angle_data"] = {
-                    "left": self.left_angle,
-                    "right": self.right_angle,
-                    "frames": self.frames
-                }
-            elif exercise_choice == 3:  # Sit-up
-                summary["angle_data"] = {
-                    "body": self.body_angles,
-                    "frames": self.frames
-                }
+        summary["inference"] = dict(self.inference_stats)
+
+        # Add exercise-specific data if requested, reduced to a chart-sized level of detail
+        definition = exercise_registry.get(exercise_choice) if exercise_choice else None
+        if definition is not None:
+            series = align_series(
+                {name: self.series(name).to_list() for name in definition.series},
+                {name: self.series_frames[name].to_list() for name in definition.series}
+            )
+            summary["angle_data"] = summarize_series(
+                series, max_points, mode=mode, encoding=encoding, reference=definition.reference_series
+            )
 
         return summary
 
-    async def process_frame(self, frame_bytes, user_id, exercise_choice):
+    def series(self, name):
+        """Return the bounded history for an angle series: "left", "right", "body" or "frames"."""
+        return {
+            "left": self.left_angle,
+            "right": self.right_angle,
+            "body": self.body_angles,
+            "frames": self.frames
+        }[name]
+
+    async def spill_angle_chunks(self, final=False):
+        """
+        Persist full-resolution angle series to MongoDB in fixed-size chunks.
+
+        Chunks are written before the ring buffers overwrite them. Angle
+        chunks carry the frame index of every value so they can be lined up
+        with each other. With ``final`` the remaining partial chunk is
+        written too.
+        """
+        from database.mongodb import save_angle_chunks
+
+        chunks = []
+        for name in ANGLE_SERIES:
+            series = self.series(name)
+            while series.total - self.spilled[name] >= GYM_ANGLE_SPILL_CHUNK or (
+                    final and series.total > self.spilled[name]):
+                values = series.since(self.spilled[name])[:GYM_ANGLE_SPILL_CHUNK]
+                chunk = {
+                    "session_key": self.session_key,
+                    "series": name,
+                    "start": self.spilled[name],
+                    "values": values,
+                    "timestamp": datetime.now().isoformat()
+                }
+                if name in self.series_frames:
+                    # Frame index of each value, since angle series skip frames of other exercises
+                    chunk["frames"] = self.series_frames[name].since(self.spilled[name])[:len(values)]
+                chunks.append(chunk)
+                self.spilled[name] += len(values)
+
+        if chunks:
+            await save_angle_chunks(chunks)
+
+    def record(self, recorded):
+        """Append one frame's recorded angles and its frame index to the histories."""
+        for name, value in recorded:
+            self.series(name).append(value)
+            self.series_frames[name].append(self.frame_count)
+        self.frames.append(self.frame_count)
+        self.frame_count += 1
+
+    def recognise_landmarks(self, landmarks, angles, exercise_choice):
+        """Feed one frame's landmark array and joint angles to the chosen exercise's rules."""
+        definition = exercise_registry.get(exercise_choice)
+        recorded = []
+        if definition is not None:
+            recorded = definition.evaluate(self, definition.metrics(landmarks, angles).tolist())
+        self.record(recorded)
+
+    async def process_frame(self, frame_bytes, session_key, exercise_choice):
         """Process a single frame and return exercise recognition results."""
-        # Convert bytes to numpy array
-        nparr = np.frombuffer(frame_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        # Perform pose detection
-        with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-            # Convert frame to RGB for MediaPipe
-            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            image.flags.writeable = False
-
-            # Pose detection
-            results = pose.process(image)
-
-            # Process landmarks if detected
-            if results.pose_landmarks:
-                # Call the appropriate exercise recognition function
-                if exercise_choice == 1:
-                    self.recognise_squat(results)
-                elif exercise_choice == 2:
-                    self.recognise_curl(results)
-                elif exercise_choice == 3:
-                    self.recognise_situp(results)
-                elif exercise_choice == 4:
-                    self.recognise_lunge(results)
-                elif exercise_choice == 5:
-                    self.recognise_pushup(results)
-
-                self.frames.append(self.frame_count)
-                self.frame_count += 1
-
-            # Prepare response
-            response = {
-                "exercise_type": ['', 'Squat', 'Curl', 'Sit-up', 'Lunge', 'Pushup'][exercise_choice],
-                "reps": self.exercise_counters[exercise_choice],
-                "feedback": self.feedback,
-                "state": self.state
-            }
-
-            return response
-
-    async def save_exercise_data(self, user_id, db):
+        # Decode and run pose inference in this session's vision worker
+        landmarks, inferred = await vision_executor.detect(session_key, frame_bytes)
+        self.inference_stats["inferred" if inferred else "reused"] += 1
+
+        # Process landmarks if detected
+        if landmarks is not None:
+            self.recognise_landmarks(landmarks, joint_angles(landmarks), exercise_choice)
+
+            if GYM_ANGLE_SPILL and self.session_key:
+                await self.spill_angle_chunks()
+
+        # Prepare response
+        response = {
+            "exercise_type": exercise_registry.label(exercise_choice),
+            "reps": self.exercise_counters[exercise_choice],
+            "feedback": self.feedback,
+            "state": self.state
+        }
+
+        return response
+
+    async def save_exercise_data(self, user_id, db, exercise_choice=None, **summary_options):
         """Save the current exercise session data to the database."""
-        from database.mongodb import save_exercise_data
+        from database.mongodb import save_exercise_records
 
-        for i in range(1, 6):
-            if self.exercise_counters[i] > 0:
-                exercise_data = {
+        exercise_records = []
+        for exercise in exercise_registry.all():
+            if self.exercise_counters[exercise.id] > 0:
+                exercise_records.append({
                     "timestamp": datetime.now().isoformat(),
-                    "exercise_type": ['', 'Squat', 'Curl', 'Sit-up', 'Lunge', 'Pushup'][i],
-                    "reps": self.exercise_counters[i],
+                    "exercise_type": exercise.name,
+                    "reps": self.exercise_counters[exercise.id],
                     "accuracy": 95,  # Placeholder for actual accuracy calculation
                     "feedback": "Session completed successfully"
-                }
-                await save_exercise_data(user_id, exercise_data)
+                })
 
-        # Return summary
-        return self.get_performance_summary()
+        # One buffered batch for the whole session instead of an insert per exercise
+        if exercise_records:
+            await save_exercise_records(user_id, exercise_records)
 
+        if GYM_ANGLE_SPILL and self.session_key:
+            await self.spill_angle_chunks(final=True)
 
-# Create a singleton instance
-gym_trainer_service = GymTrainerService()
\ No newline at end of file
+        # Return summary
+        return self.get_performance_summary(exercise_choice, **summary_options)
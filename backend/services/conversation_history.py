@@ -0,0 +1,167 @@
+import os
+import json
+import hashlib
+
+from services.llm_client import llm_client
+from services.response_cache import response_cache, make_cache_key
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character-based estimate
+    tiktoken = None
+
+# Conversation history budget for doctor queries
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "2000"))
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "300"))
+HISTORY_SUMMARY_MODEL = os.getenv("HISTORY_SUMMARY_MODEL", os.getenv("LLM_MODEL", "gpt-4o"))
+HISTORY_SUMMARY_PROMPT_VERSION = "1"
+
+# Tokens the chat format adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a conversation between a user and an AI medical assistant.
+Update the summary with the new messages. Keep every symptom, condition, medication, age or
+history detail, and any advice already given. Be concise and write plain prose.
+"""
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Count tokens with tiktoken when installed, otherwise estimate ~4 characters per token."""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            try:
+                _encoding = tiktoken.encoding_for_model(HISTORY_SUMMARY_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message):
+    return count_tokens(str(message["content"])) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _messages_digest(messages):
+    canonical = json.dumps([[m["role"], str(m["content"])] for m in messages], separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ConversationHistory:
+    """
+    Keeps the history sent with each query within a fixed token budget.
+
+    The newest messages that fit in ``max_tokens`` are sent verbatim; older
+    ones are folded into a rolling summary. Summaries are cached per
+    conversation along with how many messages they cover, so each turn only
+    summarizes the messages that newly slid out of the window.
+    """
+
+    def __init__(self, max_tokens=HISTORY_MAX_TOKENS, summary_max_tokens=HISTORY_SUMMARY_MAX_TOKENS):
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+
+    def split(self, messages):
+        """
+        Split messages into (older, recent) where recent is the newest suffix within budget.
+        """
+        budget = self.max_tokens
+        start = len(messages)
+        while start > 0:
+            cost = message_tokens(messages[start - 1])
+            if cost > budget:
+                break
+            budget -= cost
+            start -= 1
+        return messages[:start], messages[start:]
+
+    async def compact(self, messages, user_id, conversation_id=None):
+        """
+        Return the history to send: a summary of older turns plus the recent window.
+
+        Args:
+            messages: Full conversation history as role/content dicts
+            user_id: The ID of the user
+            conversation_id: Optional conversation identifier; defaults to one
+                derived from the conversation's first message
+
+        Returns:
+            list: Messages to include in the prompt
+        """
+        messages = [
+            {"role": m["role"], "content": m["content"]}
+            for m in messages or []
+            if isinstance(m, dict) and "role" in m and "content" in m
+        ]
+        older, recent = self.split(messages)
+        if not older:
+            return recent
+
+        conversation = conversation_id or _messages_digest(older[:1])
+        summary = await self._summary(user_id, conversation, older)
+        if not summary:
+            return recent
+        return [{"role": "system", "content": f"Summary of the earlier conversation: {summary}"}] + recent
+
+    async def _summary(self, user_id, conversation, older):
+        cache_key = make_cache_key(
+            "conversation_summary",
+            {"user_id": user_id, "conversation_id": conversation},
+            HISTORY_SUMMARY_PROMPT_VERSION
+        )
+        cached = await response_cache.get(cache_key, namespace="conversation_summary")
+
+        # Reuse the cached summary if it still describes a prefix of the older messages
+        previous, covered = None, 0
+        if cached and cached["covered"] <= len(older) and cached["digest"] == _messages_digest(older[:cached["covered"]]):
+            previous, covered = cached["summary"], cached["covered"]
+            if covered == len(older):
+                return previous
+
+        try:
+            summary = previous
+            for batch in self._batches(older[covered:]):
+                summary = await self._summarize(summary, batch)
+        except Exception as e:
+            # Dropping the older turns keeps the prompt bounded if summarizing fails
+            print(f"Error summarizing conversation history: {str(e)}")
+            return previous
+
+        await response_cache.set(
+            cache_key,
+            {"summary": summary, "covered": len(older), "digest": _messages_digest(older)},
+            namespace="conversation_summary"
+        )
+        return summary
+
+    def _batches(self, messages):
+        # Fold long backlogs in window-sized pieces so no summary prompt is unbounded
+        batch, used = [], 0
+        for message in messages:
+            cost = message_tokens(message)
+            if batch and used + cost > self.max_tokens:
+                yield batch
+                batch, used = [], 0
+            batch.append(message)
+            used += cost
+        if batch:
+            yield batch
+
+    async def _summarize(self, previous, new_messages):
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in new_messages)
+        content = f"Current summary:\n{previous}\n\nNew messages:\n{transcript}" if previous else f"Messages:\n{transcript}"
+        return await llm_client.chat_completion(
+            [
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": content}
+            ],
+            model=HISTORY_SUMMARY_MODEL,
+            max_tokens=self.summary_max_tokens
+        )
+
+
+# Shared history manager for doctor queries
+conversation_history = ConversationHistory()
@@ -0,0 +1,175 @@
+import os
+import csv
+from collections import OrderedDict
+
+# Candidate locations for the doctor directory CSV, probed once per load
+DOCTOR_CSV_PATHS = [
+    os.getenv("DOCTOR_CSV_PATH", ""),
+    os.path.join(os.path.dirname(__file__), "../data/doc_csv.csv"),
+    os.path.join(os.path.dirname(__file__), "data/doc_csv.csv"),
+    os.path.join(os.getcwd(), "data/doc_csv.csv"),
+    "data/doc_csv.csv",
+    "doc_csv.csv"
+]
+
+# Distinct specialty keywords whose matches are memoized per directory snapshot
+DOCTOR_KEYWORD_CACHE_SIZE = int(os.getenv("DOCTOR_KEYWORD_CACHE_SIZE", "256"))
+
+# Used when no CSV file can be found
+SAMPLE_DOCTORS = [
+    {"name": "Dr. Jane Smith", "specialty": "General Practitioner", "contact": "555-1234",
+     "location": "Central Medical Center"},
+    {"name": "Dr. John Johnson", "specialty": "Cardiologist", "contact": "555-5678",
+     "location": "Heart Health Clinic"},
+    {"name": "Dr. Sarah Williams", "specialty": "Dermatologist", "contact": "555-9012",
+     "location": "Skin Care Center"},
+    {"name": "Dr. Michael Brown", "specialty": "Neurologist", "contact": "555-3456",
+     "location": "Brain & Nerve Center"},
+    {"name": "Dr. Emily Davis", "specialty": "Pulmonologist", "contact": "555-7890",
+     "location": "Respiratory Care Institute"},
+    {"name": "Dr. Robert Wilson", "specialty": "Gastroenterologist", "contact": "555-2345",
+     "location": "Digestive Health Center"},
+    {"name": "Dr. Lisa Martinez", "specialty": "Orthopedist", "contact": "555-6789",
+     "location": "Joint & Bone Specialists"},
+    {"name": "Dr. Amanda Harris", "specialty": "Neurologist", "contact": "555-2345",
+     "location": "Neurology Associates"},
+    {"name": "Dr. Thomas White", "specialty": "ENT Specialist", "contact": "555-8901", "location": "ENT Clinic"}
+]
+
+
+def normalize_text(value):
+    """Case-fold and collapse whitespace for index keys."""
+    return " ".join(str(value or "").split()).casefold()
+
+
+class _DirectoryIndex:
+    """Immutable snapshot of the directory, swapped in whole on reload."""
+
+    def __init__(self, records):
+        self.records = records
+        self.by_specialty = {}
+        self.by_location = {}
+        for position, record in enumerate(records):
+            specialty = normalize_text(record.get("specialty"))
+            if specialty:
+                self.by_specialty.setdefault(specialty, []).append(position)
+            location = normalize_text(record.get("location"))
+            if location:
+                self.by_location.setdefault(location, []).append(position)
+        self.keyword_matches = OrderedDict()
+
+
+class DoctorDirectory:
+    """
+    In-memory doctor directory indexed by normalized specialty and location.
+
+    The CSV is parsed once and kept as plain dicts. Specialty lookups match
+    a keyword against the distinct specialties rather than every row, and
+    results for the most recently used DOCTOR_KEYWORD_CACHE_SIZE keywords
+    are memoized until the next reload. The file is reloaded when its mtime
+    changes or when ``reload`` is called.
+    """
+
+    def __init__(self, paths=None):
+        self.paths = paths if paths is not None else DOCTOR_CSV_PATHS
+        self.path = None
+        self.mtime = None
+        self._index = _DirectoryIndex([])
+
+    def _find_path(self):
+        for path in self.paths:
+            if path and os.path.exists(path):
+                return path
+        return None
+
+    def _read_csv(self, path):
+        with open(path, newline="", encoding="utf-8") as f:
+            return [
+                {key: (value.strip() if value and value.strip() else None) for key, value in row.items() if key}
+                for row in csv.DictReader(f)
+            ]
+
+    def load(self):
+        """
+        Load (or reload) the directory and rebuild its indexes.
+
+        Returns:
+            int: Number of doctors loaded
+        """
+        try:
+            path = self._find_path()
+            if path is None:
+                print("CSV file not found in expected locations, creating sample data")
+                records, mtime = [dict(doctor) for doctor in SAMPLE_DOCTORS], None
+            else:
+                mtime = os.path.getmtime(path)
+                records = self._read_csv(path)
+                print(f"Successfully loaded {len(records)} doctors from {path}")
+        except Exception as e:
+            print(f"Error loading doctor CSV: {str(e)}")
+            # Keep serving the previous snapshot if the new file cannot be read
+            return len(self._index.records)
+
+        self._index = _DirectoryIndex(records)
+        self.path = path
+        self.mtime = mtime
+        return len(records)
+
+    def reload(self):
+        """Force a reload from disk."""
+        return self.load()
+
+    def reload_if_changed(self):
+        """Reload when the CSV has been modified since it was last loaded."""
+        if self.path is None:
+            return False
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime == self.mtime:
+            return False
+        self.load()
+        return True
+
+    def all(self):
+        """Return every doctor record."""
+        return self._index.records
+
+    def find_by_specialty(self, keyword):
+        """
+        Return doctors whose specialty contains the keyword, case-insensitively.
+
+        Results keep the directory's row order. An empty keyword matches nothing.
+        """
+        index = self._index
+        keyword = normalize_text(keyword)
+        if not keyword:
+            return []
+        positions = index.keyword_matches.get(keyword)
+        if positions is None:
+            positions = sorted(
+                position
+                for specialty, specialty_positions in index.by_specialty.items()
+                if keyword in specialty
+                for position in specialty_positions
+            )
+            # Keywords come from client input, so keep only the most recent ones
+            index.keyword_matches[keyword] = positions
+            while len(index.keyword_matches) > DOCTOR_KEYWORD_CACHE_SIZE:
+                index.keyword_matches.popitem(last=False)
+        else:
+            index.keyword_matches.move_to_end(keyword)
+        return [index.records[position] for position in positions]
+
+    def find_by_location(self, location):
+        """Return doctors whose location matches exactly after normalization."""
+        index = self._index
+        return [index.records[position] for position in index.by_location.get(normalize_text(location), [])]
+
+    def __len__(self):
+        return len(self._index.records)
+
+
+# Shared directory loaded once at startup
+doctor_directory = DoctorDirectory()
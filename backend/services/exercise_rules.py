@@ -0,0 +1,199 @@
+import os
+import json
+import math
+import operator
+
+import numpy as np
+import mediapipe as mp
+
+from services.pose_angles import ANGLE_INDEX
+
+PoseLandmark = mp.solutions.pose.PoseLandmark
+
+# Exercise definitions: metrics, recorded series and rep-counting rules per exercise
+EXERCISE_DEFINITIONS_PATH = os.getenv(
+    "EXERCISE_DEFINITIONS_PATH",
+    os.path.join(os.path.dirname(__file__), "exercise_definitions.json")
+)
+
+# Value recorded for every series when a frame's angles cannot be read
+FALLBACK_ANGLE = 180
+
+COMPARISONS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+}
+
+
+def _landmark_index(name):
+    try:
+        return PoseLandmark[name.upper()].value
+    except KeyError:
+        raise ValueError(f"Unknown pose landmark: {name}")
+
+
+class ExerciseDefinition:
+    """
+    One exercise compiled from its declarative definition.
+
+    Metrics are resolved to joint-angle columns and landmark rows once, so
+    evaluating a frame (or a whole stack of frames) is a couple of NumPy
+    gathers followed by a walk over a precompiled rule table.
+
+    Rules run in order like a chain of ``if`` statements; a rule marked
+    ``elif`` only runs when no rule since the last plain ``if`` has fired.
+    A rule fires when all of its metric conditions hold and the tracker's
+    state and flags match; it can then set the state, flags and feedback
+    and count a rep.
+    """
+
+    def __init__(self, spec):
+        self.id = spec["id"]
+        self.key = spec["key"]
+        self.name = spec["name"]
+        self.display_name = spec.get("display_name", self.name)
+        self.summary_label = spec.get("summary_label", self.name)
+        self.muscles = list(spec.get("muscles", []))
+        self.series = dict(spec["series"])
+        self.reference_series = spec.get("reference_series", next(iter(self.series)))
+
+        self.metric_names = list(spec["metrics"])
+        metric_column = {name: i for i, name in enumerate(self.metric_names)}
+
+        # Angle metrics gather columns of the joint-angle array
+        self._angle_metrics = []
+        self._angle_columns = []
+        # Width metrics: (x[a] - x[b]) - (x[c] - x[d]) over landmark rows
+        self._width_metrics = []
+        self._width_rows = []
+        for name, metric in spec["metrics"].items():
+            if "angle" in metric:
+                if metric["angle"] not in ANGLE_INDEX:
+                    raise ValueError(f"Unknown joint angle in {self.key}: {metric['angle']}")
+                self._angle_metrics.append(metric_column[name])
+                self._angle_columns.append(ANGLE_INDEX[metric["angle"]])
+            elif "width_difference" in metric:
+                (a, b), (c, d) = metric["width_difference"]
+                self._width_metrics.append(metric_column[name])
+                self._width_rows.append([_landmark_index(point) for point in (a, b, c, d)])
+            else:
+                raise ValueError(f"Unsupported metric in {self.key}: {name}")
+        self._angle_metrics = np.array(self._angle_metrics, dtype=np.int64)
+        self._angle_columns = np.array(self._angle_columns, dtype=np.int64)
+        self._width_metrics = np.array(self._width_metrics, dtype=np.int64)
+        self._width_rows = np.array(self._width_rows, dtype=np.int64).reshape(-1, 4)
+
+        self._series_columns = [(name, metric_column[metric]) for name, metric in self.series.items()]
+        self.rules = [self._compile_rule(rule, metric_column) for rule in spec["rules"]]
+
+    def _compile_rule(self, rule, metric_column):
+        conditions = tuple(
+            (metric_column[metric], COMPARISONS[op], value) for metric, op, value in rule.get("if", [])
+        )
+        return (
+            bool(rule.get("elif", False)),
+            conditions,
+            rule.get("state"),
+            tuple(rule.get("flags", {}).items()),
+            rule.get("set_state"),
+            tuple(rule.get("set_flags", {}).items()),
+            rule.get("feedback"),
+            bool(rule.get("count", False)),
+        )
+
+    def metrics(self, landmarks, angles):
+        """
+        Compute this exercise's metrics for one frame or a stack of frames.
+
+        Args:
+            landmarks: (33, 3) or (N, 33, 3) landmark array
+            angles: Matching joint-angle array from joint_angles
+
+        Returns:
+            numpy.ndarray: (M,) or (N, M) metric values in metric_names order
+        """
+        values = np.empty(angles.shape[:-1] + (len(self.metric_names),), dtype=np.float64)
+        values[..., self._angle_metrics] = angles[..., self._angle_columns]
+        if len(self._width_metrics):
+            x = landmarks[..., 0]
+            rows = self._width_rows
+            values[..., self._width_metrics] = (
+                (x[..., rows[:, 0]] - x[..., rows[:, 1]]) - (x[..., rows[:, 2]] - x[..., rows[:, 3]])
+            )
+        return values
+
+    def evaluate(self, tracker, values):
+        """
+        Run the rule table for one frame against a tracker's state.
+
+        Args:
+            tracker: Object with state, feedback, exercise_counters and flag attributes
+            values: Sequence of metric values in metric_names order
+
+        Returns:
+            list: (series name, value) pairs to record for this frame
+        """
+        recorded = [values[column] for _, column in self._series_columns]
+        if not all(math.isfinite(value) for value in recorded):
+            return [(name, FALLBACK_ANGLE) for name, _ in self._series_columns]
+
+        fired = False
+        for is_elif, conditions, state, flags, set_state, set_flags, feedback, count in self.rules:
+            if is_elif and fired:
+                continue
+            matched = (
+                (state is None or tracker.state == state)
+                and all(getattr(tracker, flag) == expected for flag, expected in flags)
+                and all(compare(values[column], threshold) for column, compare, threshold in conditions)
+            )
+            fired = (fired or matched) if is_elif else matched
+            if not matched:
+                continue
+            if set_state is not None:
+                tracker.state = set_state
+            for flag, value in set_flags:
+                setattr(tracker, flag, value)
+            if feedback is not None:
+                tracker.feedback = feedback
+            if count:
+                tracker.exercise_counters[self.id] += 1
+
+        return [(name, int(value)) for (name, _), value in zip(self._series_columns, recorded)]
+
+
+class ExerciseRegistry:
+    """Exercise definitions loaded from a JSON file, keyed by exercise id."""
+
+    def __init__(self, path=EXERCISE_DEFINITIONS_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.initial_state = data.get("initial_state", "Up")
+        self.flags = dict(data.get("flags", {}))
+        self._definitions = {}
+        for spec in data["exercises"]:
+            definition = ExerciseDefinition(spec)
+            self._definitions[definition.id] = definition
+
+    def get(self, exercise_id):
+        return self._definitions.get(exercise_id)
+
+    def all(self):
+        return list(self._definitions.values())
+
+    def label(self, exercise_id):
+        """Return the exercise name used in responses and records, or '' if unknown."""
+        definition = self._definitions.get(exercise_id)
+        return definition.name if definition else ""
+
+    def __contains__(self, exercise_id):
+        return exercise_id in self._definitions
+
+    def __len__(self):
+        return len(self._definitions)
+
+
+# Shared registry used by the gym trainer service
+exercise_registry = ExerciseRegistry()
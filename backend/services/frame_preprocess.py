@@ -0,0 +1,154 @@
+import os
+import struct
+
+import cv2
+import numpy as np
+
+# Frame preprocessing configuration
+VISION_MAX_INPUT_DIM = int(os.getenv("VISION_MAX_INPUT_DIM", "640"))
+VISION_ROI_CROP = os.getenv("VISION_ROI_CROP", "true").lower() == "true"
+VISION_ROI_MARGIN = float(os.getenv("VISION_ROI_MARGIN", "0.25"))
+# Landmarks closer than this fraction of the region's size to its edge move the region
+VISION_ROI_EDGE = float(os.getenv("VISION_ROI_EDGE", "0.05"))
+
+# cv2.imdecode flags that decode straight to a reduced size (JPEG scales during decode)
+REDUCED_DECODE_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+}
+
+# JPEG start-of-frame markers that carry the image dimensions
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def image_dimensions(data):
+    """
+    Read width and height from a JPEG or PNG header without decoding it.
+
+    Returns:
+        tuple: (width, height), or None if the header is not recognised
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+
+    if data[:2] != b"\xff\xd8":
+        return None
+    position = 2
+    while position + 9 < len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            # Standalone markers carry no length field
+            position += 2
+            continue
+        segment_length = struct.unpack(">H", data[position + 2:position + 4])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[position + 5:position + 9])
+            return width, height
+        position += 2 + segment_length
+    return None
+
+
+def decode_reduction(width, height, max_dim=VISION_MAX_INPUT_DIM):
+    """Return the largest decode reduction that keeps the long side at least max_dim."""
+    long_side = max(width, height)
+    for factor in sorted(REDUCED_DECODE_FLAGS, reverse=True):
+        if long_side // factor >= max_dim:
+            return factor
+    return 1
+
+
+def decode_frame(frame_bytes, max_dim=VISION_MAX_INPUT_DIM):
+    """
+    Decode a frame no larger than the pose model needs.
+
+    High-resolution JPEGs are decoded at 1/2, 1/4 or 1/8 scale directly,
+    and whatever remains above max_dim on the long side is resized down.
+    The aspect ratio is preserved, so normalized landmarks are unaffected.
+
+    Returns:
+        numpy.ndarray: BGR image
+    """
+    dimensions = image_dimensions(frame_bytes) if max_dim > 0 else None
+    factor = decode_reduction(*dimensions, max_dim) if dimensions else 1
+    flag = REDUCED_DECODE_FLAGS.get(factor, cv2.IMREAD_COLOR)
+
+    frame = cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), flag)
+    if frame is None:
+        raise ValueError("Could not decode image data")
+
+    height, width = frame.shape[:2]
+    if max_dim > 0 and max(height, width) > max_dim:
+        scale = max_dim / max(height, width)
+        frame = cv2.resize(
+            frame, (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA
+        )
+    return frame
+
+
+def roi_from_landmarks(landmarks, margin=VISION_ROI_MARGIN):
+    """
+    Derive a normalized region of interest from a frame's landmarks.
+
+    The landmark bounding box is expanded by ``margin`` of its size on every
+    side so the next frame's movement stays inside it.
+
+    Returns:
+        tuple: (x0, y0, x1, y1) in normalized [0, 1] coordinates
+    """
+    x0, y0 = landmarks[:, 0].min(), landmarks[:, 1].min()
+    x1, y1 = landmarks[:, 0].max(), landmarks[:, 1].max()
+    pad_x, pad_y = (x1 - x0) * margin, (y1 - y0) * margin
+    return (
+        float(np.clip(x0 - pad_x, 0.0, 1.0)), float(np.clip(y0 - pad_y, 0.0, 1.0)),
+        float(np.clip(x1 + pad_x, 0.0, 1.0)), float(np.clip(y1 + pad_y, 0.0, 1.0))
+    )
+
+
+def roi_contains(roi, landmarks, edge=VISION_ROI_EDGE):
+    """
+    Return True if every landmark lies inside the region, clear of its edges.
+
+    Landmarks must stay ``edge`` of the region's size away from each side,
+    except sides that already touch the frame border.
+    """
+    x0, y0, x1, y1 = roi
+    pad_x, pad_y = (x1 - x0) * edge, (y1 - y0) * edge
+    points = np.clip(landmarks[:, :2], 0.0, 1.0)
+    low = (x0 + pad_x if x0 > 0 else 0.0, y0 + pad_y if y0 > 0 else 0.0)
+    high = (x1 - pad_x if x1 < 1 else 1.0, y1 - pad_y if y1 < 1 else 1.0)
+    return bool(np.all(points >= low) and np.all(points <= high))
+
+
+def crop_to_roi(frame, roi):
+    """
+    Crop a frame to a normalized region of interest.
+
+    Returns:
+        tuple: (cropped image, (x offset, y offset, crop width, crop height)) in pixels,
+        or (None, None) if the region is empty
+    """
+    height, width = frame.shape[:2]
+    left, top = int(roi[0] * width), int(roi[1] * height)
+    right, bottom = int(np.ceil(roi[2] * width)), int(np.ceil(roi[3] * height))
+    if right - left < 2 or bottom - top < 2:
+        return None, None
+    return frame[top:bottom, left:right], (left, top, right - left, bottom - top)
+
+
+def landmarks_to_full_frame(landmarks, box, frame_shape):
+    """Map landmarks normalized to a crop back to full-frame normalized coordinates."""
+    left, top, crop_width, crop_height = box
+    height, width = frame_shape[:2]
+    mapped = landmarks.copy()
+    mapped[:, 0] = (landmarks[:, 0] * crop_width + left) / width
+    mapped[:, 1] = (landmarks[:, 1] * crop_height + top) / height
+    # MediaPipe scales z like x
+    mapped[:, 2] = landmarks[:, 2] * crop_width / width
+    return mapped
@@ -0,0 +1,134 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+
+from services.ai_gymtrainer import GymTrainerService
+from services.vision_executor import vision_executor
+
+# Session registry configuration
+GYM_SESSION_TTL = float(os.getenv("GYM_SESSION_TTL", "900"))
+GYM_SESSION_SWEEP_INTERVAL = float(os.getenv("GYM_SESSION_SWEEP_INTERVAL", "60"))
+
+
+def make_session_key(user_id, session_id=None):
+    """Build the registry key for a user's session."""
+    return f"{user_id}:{session_id}" if session_id else str(user_id)
+
+
+class ExerciseSession:
+    """Tracker state and lock owned by a single exercise session."""
+
+    def __init__(self, user_id, session_id=None, exercise_choice=1):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.key = make_session_key(user_id, session_id)
+        self.exercise_choice = exercise_choice
+        self.tracker = GymTrainerService(session_key=self.key)
+        self.lock = asyncio.Lock()
+        self.started_at = datetime.now().isoformat()
+        self.last_active = time.monotonic()
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+
+class SessionManager:
+    """
+    Registry of exercise sessions keyed by user_id and optional session_id.
+
+    Every session owns its own GymTrainerService, so rep counts and angle
+    histories from different users never mix. Frames for the same session
+    are serialised through the session's lock while frames for different
+    sessions proceed independently.
+    """
+
+    def __init__(self, ttl=GYM_SESSION_TTL):
+        self.ttl = ttl
+        self._sessions = {}
+
+    def start(self, user_id, session_id=None, exercise_choice=1):
+        """
+        Start a fresh session, replacing any existing one with the same key.
+
+        Returns:
+            ExerciseSession: The newly created session
+        """
+        key = make_session_key(user_id, session_id)
+        self._discard(key)
+        session = ExerciseSession(user_id, session_id, exercise_choice)
+        self._sessions[key] = session
+        return session
+
+    def get(self, user_id, session_id=None):
+        """Return an active session, or None if it does not exist or has expired."""
+        key = make_session_key(user_id, session_id)
+        session = self._sessions.get(key)
+        if session is not None and self._is_expired(session, time.monotonic()):
+            self._discard(key)
+            return None
+        return session
+
+    def get_or_create(self, user_id, session_id=None, exercise_choice=1):
+        """Return the active session, starting one if the client skipped /start-session."""
+        session = self.get(user_id, session_id)
+        if session is None:
+            session = self.start(user_id, session_id, exercise_choice)
+        session.touch()
+        return session
+
+    def end(self, user_id, session_id=None):
+        """Remove a session from the registry and return it, or None if absent."""
+        return self._discard(make_session_key(user_id, session_id))
+
+    def evict_expired(self):
+        """
+        Evict every session idle for longer than the TTL.
+
+        Returns:
+            int: Number of sessions evicted
+        """
+        now = time.monotonic()
+        expired = [key for key, session in self._sessions.items() if self._is_expired(session, now)]
+        for key in expired:
+            self._discard(key)
+        return len(expired)
+
+    def evict(self, user_id=None):
+        """
+        Evict sessions in bulk: all of one user's sessions, or every session.
+
+        Returns:
+            int: Number of sessions evicted
+        """
+        keys = [
+            key for key, session in self._sessions.items()
+            if user_id is None or session.user_id == user_id
+        ]
+        for key in keys:
+            self._discard(key)
+        return len(keys)
+
+    async def run_sweeper(self, interval=GYM_SESSION_SWEEP_INTERVAL):
+        """Periodically evict expired sessions; intended to run as a background task."""
+        while True:
+            await asyncio.sleep(interval)
+            evicted = self.evict_expired()
+            if evicted:
+                print(f"Evicted {evicted} expired exercise sessions")
+
+    def _is_expired(self, session, now):
+        return now - session.last_active > self.ttl
+
+    def _discard(self, key):
+        session = self._sessions.pop(key, None)
+        if session is not None:
+            vision_executor.release(key)
+        return session
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+# Shared registry used by the gym trainer router
+session_manager = SessionManager()
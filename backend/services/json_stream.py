@@ -0,0 +1,116 @@
+import json
+
+# Decoded values of single-character JSON escapes
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonFieldStreamer:
+    """
+    Incrementally extract one top-level string field from streamed JSON.
+
+    Chunks of a JSON object are fed as they arrive from the model, and the
+    decoded text of ``field`` is returned as soon as it is available, so it
+    can be forwarded before the object is complete. The full raw text is
+    kept for parsing once the stream ends.
+    """
+
+    def __init__(self, field):
+        self.field = field
+        self.parts = []
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._unicode = None      # hex digits of a \\uXXXX escape being read
+        self._high_surrogate = None
+        self._role = None         # "key", "value" (the target field) or None
+        self._key = []
+        self._last_key = None
+        self._expect_key = False
+        self._after_colon = False
+
+    def feed(self, chunk):
+        """
+        Consume a chunk of raw JSON text.
+
+        Returns:
+            str: Newly decoded text of the field (empty if none)
+        """
+        self.parts.append(chunk)
+        out = []
+        for ch in chunk:
+            if self._in_string:
+                self._string_char(ch, out)
+            else:
+                self._structure_char(ch)
+        return "".join(out)
+
+    def text(self):
+        """Return the raw JSON received so far."""
+        return "".join(self.parts)
+
+    def result(self):
+        """Parse the complete JSON object."""
+        return json.loads(self.text())
+
+    def _emit(self, text, out):
+        if self._role == "key":
+            self._key.append(text)
+        elif self._role == "value":
+            out.append(text)
+
+    def _string_char(self, ch, out):
+        if self._unicode is not None:
+            self._unicode.append(ch)
+            if len(self._unicode) < 4:
+                return
+            code = int("".join(self._unicode), 16)
+            self._unicode = None
+            if 0xD800 <= code < 0xDC00:
+                self._high_surrogate = code
+                return
+            if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+                code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+            self._high_surrogate = None
+            self._emit(chr(code), out)
+        elif self._escape:
+            self._escape = False
+            if ch == "u":
+                self._unicode = []
+            else:
+                self._emit(_ESCAPES.get(ch, ch), out)
+        elif ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            self._in_string = False
+            if self._role == "key":
+                self._last_key = "".join(self._key)
+            elif self._role == "value":
+                self.done = True
+            self._role = None
+            self._after_colon = False
+        else:
+            self._emit(ch, out)
+
+    def _structure_char(self, ch):
+        if ch == '"':
+            self._in_string = True
+            if self._depth == 1 and self._expect_key:
+                self._role = "key"
+                self._key = []
+                self._expect_key = False
+            elif (self._depth == 1 and self._after_colon
+                  and self._last_key == self.field and not self.done):
+                self._role = "value"
+            else:
+                self._role = None
+        elif ch in "{[":
+            self._depth += 1
+            self._expect_key = ch == "{" and self._depth == 1
+        elif ch in "}]":
+            self._depth -= 1
+        elif self._depth == 1 and ch == ":":
+            self._after_colon = True
+        elif self._depth == 1 and ch == ",":
+            self._expect_key = True
+            self._after_colon = False
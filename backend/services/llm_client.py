@@ -0,0 +1,228 @@
+import os
+import json
+import random
+import hashlib
+import asyncio
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+from services.single_flight import SingleFlight
+
+# Load environment variables
+load_dotenv()
+
+# OpenAI API configuration
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Point at a local fake server to exercise the client without calling OpenAI
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
+
+# Connection pool, concurrency and retry settings
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+# Share one upstream call between identical concurrent completions
+LLM_SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "true").lower() == "true"
+
+# Errors worth retrying: network failures, timeouts, rate limits and 5xx responses
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+def _normalize_prompt(value):
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {key: _normalize_prompt(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_prompt(item) for item in value]
+    return value
+
+
+def request_key(model, messages, kwargs):
+    """Identify a completion request by its model, whitespace-normalized messages and options."""
+    canonical = json.dumps(
+        {"model": model, "messages": _normalize_prompt(messages), "options": kwargs},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMClient:
+    """
+    Async chat-completion client shared by every AI service.
+
+    All services reuse one pooled HTTP connection set. A semaphore caps how
+    many completions are in flight at once, and transient failures are
+    retried with exponential backoff and full jitter. Identical completions
+    requested while one is already in flight share its upstream call.
+    """
+
+    def __init__(self, api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL,
+                 max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT,
+                 max_retries=LLM_MAX_RETRIES, single_flight=LLM_SINGLE_FLIGHT):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.single_flight = single_flight
+        self._client = None
+        self._slots = None
+        self._flights = SingleFlight()
+
+    def _get_client(self):
+        if self._client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS
+                ),
+                timeout=self.timeout
+            )
+            # Retries are handled here so they share the concurrency limit
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=self.timeout,
+                max_retries=0,
+                http_client=http_client
+            )
+        return self._client
+
+    def _backoff_delay(self, attempt):
+        return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+    async def chat_completion(self, messages, model=LLM_MODEL, **kwargs):
+        """
+        Run a chat completion and return the message content.
+
+        Args:
+            messages: Chat messages to send
+            model: Model name to use
+            **kwargs: Extra arguments for chat.completions.create
+
+        Returns:
+            str: Content of the first choice
+        """
+        if not self.single_flight:
+            return await self._complete(messages, model, **kwargs)
+        return await self._flights.do(
+            request_key(model, messages, kwargs),
+            lambda: self._complete(messages, model, **kwargs)
+        )
+
+    async def _complete(self, messages, model, **kwargs):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+
+        client = self._get_client()
+        attempt = 0
+        while True:
+            try:
+                async with self._slots:
+                    response = await client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        **kwargs
+                    )
+                return response.choices[0].message.content
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                attempt += 1
+                print(f"LLM call failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def chat_json(self, messages, model=LLM_MODEL, **kwargs):
+        """
+        Run a JSON-mode chat completion and return the parsed object.
+
+        Returns:
+            dict: The parsed JSON response
+        """
+        content = await self.chat_completion(
+            messages,
+            model=model,
+            response_format={"type": "json_object"},
+            **kwargs
+        )
+        return json.loads(content)
+
+    async def stream_chat_completion(self, messages, model=LLM_MODEL, **kwargs):
+        """
+        Stream a chat completion, yielding content deltas as they arrive.
+
+        Failures are only retried before the first delta has been yielded;
+        once text has reached the caller the error is raised instead.
+
+        Args:
+            messages: Chat messages to send
+            model: Model name to use
+            **kwargs: Extra arguments for chat.completions.create
+
+        Yields:
+            str: Content fragments of the first choice
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+
+        client = self._get_client()
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self._slots:
+                    stream = await client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        stream=True,
+                        **kwargs
+                    )
+                    # Close the stream even if the consumer stops early so the connection is released
+                    try:
+                        async for chunk in stream:
+                            if not chunk.choices:
+                                continue
+                            content = chunk.choices[0].delta.content
+                            if content:
+                                started = True
+                                yield content
+                    finally:
+                        await stream.close()
+                return
+            except RETRYABLE_ERRORS as e:
+                if started or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                attempt += 1
+                print(f"LLM stream failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def stats(self):
+        """Return request coalescing counters."""
+        return self._flights.stats()
+
+    async def close(self):
+        """Close the pooled HTTP connections."""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+# Shared client used by all AI services
+llm_client = LLMClient()
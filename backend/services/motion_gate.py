@@ -0,0 +1,53 @@
+import os
+
+import cv2
+import numpy as np
+
+# Motion gating configuration; a threshold of 0 runs inference on every frame
+VISION_MOTION_THRESHOLD = float(os.getenv("VISION_MOTION_THRESHOLD", "0"))
+VISION_MAX_SKIP = int(os.getenv("VISION_MAX_SKIP", "5"))
+
+# Size of the grayscale thumbnail used as a frame signature
+SIGNATURE_SIZE = (32, 32)
+
+
+def frame_signature(frame):
+    """Return a cheap grayscale thumbnail used to compare frames."""
+    return cv2.resize(
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), SIGNATURE_SIZE, interpolation=cv2.INTER_AREA
+    ).astype(np.int16)
+
+
+class MotionGate:
+    """
+    Skips pose inference while the scene is effectively unchanged.
+
+    Each frame's thumbnail is compared with the thumbnail of the last frame
+    that actually ran inference. When the mean absolute difference is below
+    ``threshold`` (0-255 grayscale), that frame's landmarks are reused, up to
+    ``max_skip`` frames in a row so slow movement is still picked up.
+    """
+
+    def __init__(self, threshold=VISION_MOTION_THRESHOLD, max_skip=VISION_MAX_SKIP):
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.last_signature = None
+        self.last_landmarks = None
+        self.skipped = 0
+
+    def reuse(self, signature):
+        """
+        Return the last landmarks if this frame can skip inference, else None.
+        """
+        if self.threshold <= 0 or self.last_landmarks is None or self.skipped >= self.max_skip:
+            return None
+        if np.abs(signature - self.last_signature).mean() >= self.threshold:
+            return None
+        self.skipped += 1
+        return self.last_landmarks
+
+    def update(self, signature, landmarks):
+        """Record the result of a frame that ran inference."""
+        self.last_signature = signature
+        self.last_landmarks = landmarks
+        self.skipped = 0
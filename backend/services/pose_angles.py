@@ -0,0 +1,67 @@
+import numpy as np
+import mediapipe as mp
+
+PoseLandmark = mp.solutions.pose.PoseLandmark
+
+NUM_LANDMARKS = 33
+
+# Joint angles used by the exercise recognisers: name -> (end point, vertex, end point)
+JOINT_ANGLES = {
+    "left_knee": (PoseLandmark.LEFT_HIP, PoseLandmark.LEFT_KNEE, PoseLandmark.LEFT_HEEL),
+    "right_knee": (PoseLandmark.RIGHT_HIP, PoseLandmark.RIGHT_KNEE, PoseLandmark.RIGHT_HEEL),
+    "left_elbow": (PoseLandmark.LEFT_SHOULDER, PoseLandmark.LEFT_ELBOW, PoseLandmark.LEFT_WRIST),
+    "right_elbow": (PoseLandmark.RIGHT_SHOULDER, PoseLandmark.RIGHT_ELBOW, PoseLandmark.RIGHT_WRIST),
+    "left_leg": (PoseLandmark.LEFT_HIP, PoseLandmark.LEFT_KNEE, PoseLandmark.LEFT_ANKLE),
+    "right_leg": (PoseLandmark.RIGHT_HIP, PoseLandmark.RIGHT_KNEE, PoseLandmark.RIGHT_ANKLE),
+    "left_hip": (PoseLandmark.LEFT_SHOULDER, PoseLandmark.LEFT_HIP, PoseLandmark.LEFT_KNEE),
+}
+
+# Column of each joint angle in the arrays returned by joint_angles
+ANGLE_INDEX = {name: i for i, name in enumerate(JOINT_ANGLES)}
+
+_FIRST = np.array([int(a) for a, _, _ in JOINT_ANGLES.values()])
+_VERTEX = np.array([int(b) for _, b, _ in JOINT_ANGLES.values()])
+_LAST = np.array([int(c) for _, _, c in JOINT_ANGLES.values()])
+
+
+def landmarks_to_array(landmarks):
+    """
+    Copy MediaPipe landmarks into a (33, 3) float array of x, y, z.
+
+    Args:
+        landmarks: Sequence of 33 landmarks with x, y and z attributes
+
+    Returns:
+        numpy.ndarray: The filled array
+    """
+    out = np.empty((NUM_LANDMARKS, 3), dtype=np.float64)
+    for i, landmark in enumerate(landmarks):
+        out[i, 0] = landmark.x
+        out[i, 1] = landmark.y
+        out[i, 2] = landmark.z
+    return out
+
+
+def joint_angles(landmarks):
+    """
+    Compute every joint angle in JOINT_ANGLES in one vectorized pass.
+
+    Each angle is measured at the vertex in the x-y plane and folded into
+    [0, 180] degrees.
+
+    Args:
+        landmarks: (33, 3) array for one frame, or (N, 33, 3) for a stack of frames
+
+    Returns:
+        numpy.ndarray: (len(JOINT_ANGLES),) or (N, len(JOINT_ANGLES)) angles in degrees
+    """
+    first = landmarks[..., _FIRST, :2]
+    vertex = landmarks[..., _VERTEX, :2]
+    last = landmarks[..., _LAST, :2]
+
+    radians = (
+        np.arctan2(last[..., 1] - vertex[..., 1], last[..., 0] - vertex[..., 0])
+        - np.arctan2(first[..., 1] - vertex[..., 1], first[..., 0] - vertex[..., 0])
+    )
+    angles = np.abs(radians * 180.0 / np.pi)
+    return np.where(angles > 180.0, 360.0 - angles, angles)
@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import mediapipe as mp
+
+mp_pose = mp.solutions.pose
+
+# Pose pool configuration
+POSE_POOL_MAX_SIZE = int(os.getenv("POSE_POOL_MAX_SIZE", "16"))
+POSE_POOL_IDLE_TIMEOUT = float(os.getenv("POSE_POOL_IDLE_TIMEOUT", "120"))
+POSE_MIN_DETECTION_CONFIDENCE = float(os.getenv("POSE_MIN_DETECTION_CONFIDENCE", "0.5"))
+POSE_MIN_TRACKING_CONFIDENCE = float(os.getenv("POSE_MIN_TRACKING_CONFIDENCE", "0.5"))
+
+
+class PosePoolExhausted(Exception):
+    """Raised when every Pose instance in the pool is leased to an active session."""
+
+
+class PosePool:
+    """
+    Pool of long-lived MediaPipe Pose instances leased per session.
+
+    Each session keeps the same Pose instance for as long as it keeps sending
+    frames, so MediaPipe can track between frames instead of running a full
+    detection every time. Instances idle for longer than ``idle_timeout``
+    seconds are closed, and at most ``max_size`` instances exist at once.
+    """
+
+    def __init__(self, max_size=POSE_POOL_MAX_SIZE, idle_timeout=POSE_POOL_IDLE_TIMEOUT):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._leases = OrderedDict()  # session_key -> [pose, last_used, state]
+        self._lock = threading.Lock()
+
+    def _create_pose(self):
+        return mp_pose.Pose(
+            min_detection_confidence=POSE_MIN_DETECTION_CONFIDENCE,
+            min_tracking_confidence=POSE_MIN_TRACKING_CONFIDENCE
+        )
+
+    def lease(self, session_key):
+        """
+        Return the Pose instance leased to a session, creating one if needed.
+
+        Args:
+            session_key: Identifier of the session requesting the instance
+
+        Returns:
+            mediapipe Pose: The Pose instance owned by the session
+        """
+        return self.lease_with_state(session_key)[0]
+
+    def lease_with_state(self, session_key):
+        """
+        Return a session's Pose instance together with its per-session state dict.
+
+        The state dict lives exactly as long as the lease, so worker-side
+        data such as the last region of interest is dropped on eviction.
+
+        Returns:
+            tuple: (mediapipe Pose, dict)
+        """
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            lease = self._leases.get(session_key)
+            if lease is not None:
+                lease[1] = now
+                self._leases.move_to_end(session_key)
+                return lease[0], lease[2]
+
+            expired = self._pop_idle(now)
+
+            if len(self._leases) >= self.max_size:
+                for pose in expired:
+                    pose.close()
+                raise PosePoolExhausted(
+                    f"Pose pool is at capacity ({self.max_size} active sessions)"
+                )
+
+            pose = self._create_pose()
+            state = {}
+            self._leases[session_key] = [pose, now, state]
+
+        for idle_pose in expired:
+            idle_pose.close()
+        return pose, state
+
+    def release(self, session_key):
+        """Close and drop the Pose instance leased to a session, if any."""
+        with self._lock:
+            lease = self._leases.pop(session_key, None)
+        if lease is not None:
+            lease[0].close()
+
+    def evict_idle(self):
+        """
+        Close every Pose instance that has been idle past the timeout.
+
+        Returns:
+            int: Number of instances evicted
+        """
+        with self._lock:
+            expired = self._pop_idle(time.monotonic())
+        for pose in expired:
+            pose.close()
+        return len(expired)
+
+    def close(self):
+        """Close every Pose instance in the pool."""
+        with self._lock:
+            leases = list(self._leases.values())
+            self._leases.clear()
+        for pose, _, _ in leases:
+            pose.close()
+
+    def _pop_idle(self, now):
+        # Leases are kept in least-recently-used order, so stop at the first fresh one
+        expired = []
+        while self._leases:
+            session_key, (pose, last_used, _) = next(iter(self._leases.items()))
+            if now - last_used < self.idle_timeout:
+                break
+            del self._leases[session_key]
+            expired.append(pose)
+        return expired
+
+    def __len__(self):
+        return len(self._leases)
+
+
+# Shared pool used by the gym trainer service
+pose_pool = PosePool()
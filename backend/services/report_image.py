@@ -0,0 +1,88 @@
+import os
+import hashlib
+
+import cv2
+
+from services.frame_preprocess import decode_frame
+
+# Report image preprocessing configuration; the defaults match the vision model's
+# high-detail input, which is fit within 2048px and then to 768px on the short side
+REPORT_IMAGE_MAX_DIM = int(os.getenv("REPORT_IMAGE_MAX_DIM", "2048"))
+REPORT_IMAGE_MAX_SHORT_SIDE = int(os.getenv("REPORT_IMAGE_MAX_SHORT_SIDE", "768"))
+REPORT_IMAGE_JPEG_QUALITY = int(os.getenv("REPORT_IMAGE_JPEG_QUALITY", "85"))
+
+
+def detect_image_format(data):
+    """
+    Identify an image format from its magic bytes.
+
+    Returns:
+        str: "jpeg", "png", "webp", "gif", "bmp", "tiff", "heic", or None if unknown
+    """
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if data[:2] == b"BM":
+        return "bmp"
+    if data[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    if data[4:8] == b"ftyp" and data[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "heic"
+    return None
+
+
+def normalize_report_image(data):
+    """
+    Decode, downscale and re-encode an uploaded report image.
+
+    The real format is detected from the file contents rather than trusted
+    from the upload. The image is shrunk to the largest size the vision model
+    actually uses and re-encoded as JPEG, and a SHA-256 digest of the result
+    identifies repeat uploads of the same page. Perceptual hashes are not
+    used here because pages built on the same template collide.
+
+    Args:
+        data: Raw uploaded image bytes
+
+    Returns:
+        dict: Re-encoded image bytes, its MIME type, the source format,
+        dimensions, byte sizes and the content digest
+
+    Raises:
+        ValueError: If the format is unsupported or the image cannot be decoded
+    """
+    source_format = detect_image_format(data)
+    if source_format is None or source_format == "heic":
+        raise ValueError(f"Unsupported image format: {source_format or 'unknown'}")
+
+    image = decode_frame(data, max_dim=REPORT_IMAGE_MAX_DIM)
+
+    height, width = image.shape[:2]
+    if min(height, width) > REPORT_IMAGE_MAX_SHORT_SIDE > 0:
+        scale = REPORT_IMAGE_MAX_SHORT_SIDE / min(height, width)
+        image = cv2.resize(
+            image, (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA
+        )
+        height, width = image.shape[:2]
+
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, REPORT_IMAGE_JPEG_QUALITY])
+    if not ok:
+        raise ValueError("Could not encode image")
+
+    encoded = encoded.tobytes()
+    return {
+        "data": encoded,
+        "mime_type": "image/jpeg",
+        "source_format": source_format,
+        "width": width,
+        "height": height,
+        "original_size": len(data),
+        "size": len(encoded),
+        "digest": hashlib.sha256(encoded).hexdigest()
+    }
@@ -0,0 +1,272 @@
+import os
+import uuid
+import random
+import socket
+import asyncio
+import tempfile
+import ipaddress
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import httpx
+
+from database.mongodb import (
+    create_report_job, update_report_job, get_report_job, get_unfinished_report_jobs
+)
+from services.ai_compounder import analyze_medical_report, save_analysis_to_db
+
+# Report job queue configuration
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+REPORT_JOB_QUEUE_SIZE = int(os.getenv("REPORT_JOB_QUEUE_SIZE", "100"))
+REPORT_UPLOAD_MAX_BYTES = int(os.getenv("REPORT_UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+REPORT_JOB_SPOOL_DIR = os.getenv("REPORT_JOB_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "report_jobs"))
+REPORT_WEBHOOK_TIMEOUT = float(os.getenv("REPORT_WEBHOOK_TIMEOUT", "10"))
+REPORT_WEBHOOK_RETRIES = int(os.getenv("REPORT_WEBHOOK_RETRIES", "3"))
+# Comma-separated hosts webhooks may be sent to; empty allows any public host
+REPORT_WEBHOOK_ALLOWED_HOSTS = {
+    host.strip().lower() for host in os.getenv("REPORT_WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()
+}
+
+# Job fields returned by the status endpoint
+REPORT_JOB_FIELDS = (
+    "status", "user_id", "filename", "content_type", "size", "created_at", "started_at",
+    "finished_at", "result", "error", "webhook_status"
+)
+
+
+class ReportQueueFull(Exception):
+    """Raised when the report job queue cannot accept more uploads."""
+
+
+async def validate_callback_url(url):
+    """
+    Check that a client-supplied webhook URL is safe to call.
+
+    The URL must use https, its host must be on REPORT_WEBHOOK_ALLOWED_HOSTS
+    when that is configured, and every address the host resolves to must be
+    public, so webhooks cannot be pointed at loopback, private or link-local
+    services.
+
+    Raises:
+        ValueError: If the URL is not allowed
+    """
+    parts = urlsplit(url)
+    if parts.scheme != "https" or not parts.hostname:
+        raise ValueError("callback_url must be an https URL")
+    host = parts.hostname.lower()
+    if REPORT_WEBHOOK_ALLOWED_HOSTS and host not in REPORT_WEBHOOK_ALLOWED_HOSTS:
+        raise ValueError(f"callback_url host {host} is not allowed")
+
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(
+            host, parts.port or 443, type=socket.SOCK_STREAM
+        )
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"callback_url host {host} could not be resolved")
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        address = getattr(address, "ipv4_mapped", None) or address
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"callback_url host {host} resolves to a non-public address")
+
+
+class ReportJobQueue:
+    """
+    In-process queue of report analysis jobs backed by MongoDB job state.
+
+    Uploads are spooled to disk by the caller and enqueued by job ID. A
+    fixed pool of worker tasks runs the analyses, so at most ``workers``
+    vision calls are in flight however bursty the uploads are. Job state
+    lives in the report_jobs collection, where clients poll it; an optional
+    webhook is sent the job ID and status when a job finishes, while the
+    analysis itself is only served by the status endpoint. Jobs left queued
+    or running by a previous run are picked up again at startup if their
+    spool file remains.
+    """
+
+    def __init__(self, workers=REPORT_JOB_WORKERS, max_size=REPORT_JOB_QUEUE_SIZE,
+                 spool_dir=REPORT_JOB_SPOOL_DIR):
+        self.workers = max(1, workers)
+        self.max_size = max_size
+        self.spool_dir = spool_dir
+        self._queue = None
+        self._tasks = []
+        self._http = None
+
+    def spool_path(self, job_id):
+        """Return the path an upload for job_id is spooled to."""
+        return os.path.join(self.spool_dir, f"{job_id}.upload")
+
+    def new_job_id(self):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        return uuid.uuid4().hex
+
+    async def start(self):
+        """
+        Start the worker tasks and requeue jobs unfinished by a previous run.
+
+        Recovery runs in the background so a MongoDB outage cannot hold up
+        startup; it retries until the job collection is reachable.
+        """
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._http = httpx.AsyncClient(timeout=REPORT_WEBHOOK_TIMEOUT)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._resume_unfinished()))
+
+    async def stop(self):
+        """Stop the workers; queued jobs stay in MongoDB and resume on the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _resume_unfinished(self):
+        attempt = 0
+        while True:
+            try:
+                jobs = await get_unfinished_report_jobs()
+                break
+            except Exception as e:
+                delay = random.uniform(0, min(60, 2 ** attempt))
+                attempt += 1
+                print(f"Error loading unfinished report jobs, retry {attempt} in {delay:.2f}s: {str(e)}")
+                await asyncio.sleep(delay)
+
+        for job in jobs:
+            try:
+                if os.path.exists(self.spool_path(job["_id"])):
+                    await update_report_job(job["_id"], {"status": "queued"})
+                    # Wait for room rather than failing a job that can still run
+                    await self._queue.put(job["_id"])
+                else:
+                    await update_report_job(job["_id"], {
+                        "status": "failed",
+                        "error": "Job was interrupted before it finished",
+                        "finished_at": datetime.now().isoformat()
+                    })
+            except Exception as e:
+                print(f"Error resuming report job {job['_id']}: {str(e)}")
+
+    async def submit(self, job_id, user_id, filename, content_type, size, callback_url=None):
+        """
+        Record a job for an upload already spooled to spool_path(job_id) and enqueue it.
+
+        Returns:
+            dict: The created job
+
+        Raises:
+            ReportQueueFull: If the queue is at capacity
+        """
+        if self._queue is None or self._queue.full():
+            raise ReportQueueFull(f"Report queue is full ({self.max_size} jobs), try again shortly")
+
+        job = {
+            "_id": job_id,
+            "user_id": user_id,
+            "status": "queued",
+            "filename": filename,
+            "content_type": content_type,
+            "size": size,
+            "callback_url": callback_url,
+            "created_at": datetime.now().isoformat()
+        }
+        await create_report_job(job)
+        self._queue.put_nowait(job_id)
+        return job
+
+    async def get(self, job_id, user_id):
+        """
+        Return a job's public fields, or None if it does not exist or belongs to another user.
+        """
+        job = await get_report_job(job_id)
+        if job is None or job.get("user_id") != user_id:
+            return None
+        status = {"job_id": job["_id"]}
+        status.update({field: job[field] for field in REPORT_JOB_FIELDS if field in job})
+        if self._queue is not None and job["status"] == "queued":
+            status["queue_depth"] = self._queue.qsize()
+        return status
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"Error running report job {job_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id):
+        job = await get_report_job(job_id)
+        if job is None:
+            return
+        path = self.spool_path(job_id)
+        await update_report_job(job_id, {"status": "running", "started_at": datetime.now().isoformat()})
+
+        try:
+            loop = asyncio.get_running_loop()
+            contents = await loop.run_in_executor(None, _read_file, path)
+            analysis_result = await analyze_medical_report(contents, job["user_id"])
+        except Exception as e:
+            analysis_result = {"status": "error", "message": f"Failed to analyze medical report: {str(e)}"}
+
+        finished = {"finished_at": datetime.now().isoformat()}
+        if analysis_result["status"] == "success":
+            report_data = {
+                "filename": job.get("filename"),
+                "content_type": job.get("content_type"),
+                "size": job.get("size")
+            }
+            await save_analysis_to_db(job["user_id"], report_data, analysis_result["data"])
+            finished.update({"status": "completed", "result": analysis_result["data"]})
+        else:
+            finished.update({"status": "failed", "error": analysis_result.get("message")})
+        await update_report_job(job_id, finished)
+
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+        if job.get("callback_url"):
+            webhook_status = await self._notify(job["callback_url"], {
+                "job_id": job_id,
+                "status": finished["status"],
+                "finished_at": finished["finished_at"]
+            })
+            await update_report_job(job_id, {"webhook_status": webhook_status})
+
+    async def _notify(self, url, payload):
+        # The host is checked again in case its DNS changed since the job was submitted
+        try:
+            await validate_callback_url(url)
+        except ValueError as e:
+            print(f"Webhook to {url} rejected: {str(e)}")
+            return "rejected"
+
+        # Retry transient webhook failures with jittered backoff; give up quietly after that
+        for attempt in range(REPORT_WEBHOOK_RETRIES + 1):
+            try:
+                response = await self._http.post(url, json=payload)
+                if response.status_code < 500:
+                    return response.status_code
+            except httpx.HTTPError as e:
+                print(f"Webhook to {url} failed: {str(e)}")
+            if attempt < REPORT_WEBHOOK_RETRIES:
+                await asyncio.sleep(random.uniform(0, 2 ** attempt))
+        return "failed"
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# Shared queue used by the compounder router
+report_job_queue = ReportJobQueue()
@@ -0,0 +1,63 @@
+import os
+
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf  # Older PyMuPDF releases
+    except ImportError:  # PDF reports are rejected without PyMuPDF
+        pymupdf = None
+
+from services.report_image import REPORT_IMAGE_MAX_DIM
+
+# PDF report configuration
+REPORT_PDF_MAX_PAGES = int(os.getenv("REPORT_PDF_MAX_PAGES", "20"))
+REPORT_PDF_CONCURRENCY = int(os.getenv("REPORT_PDF_CONCURRENCY", "3"))
+
+
+def is_pdf(data):
+    """Return True if the bytes are a PDF document."""
+    return data[:5] == b"%PDF-"
+
+
+class PdfReport:
+    """
+    A PDF report whose pages are rasterized on demand.
+
+    Only the compressed document is held; each page is rendered to a PNG
+    sized for the vision model when render() is called, so memory grows
+    with the pages being processed rather than the length of the document.
+    PyMuPDF documents are not thread-safe, so callers render one page at a
+    time.
+    """
+
+    def __init__(self, data, max_dim=REPORT_IMAGE_MAX_DIM):
+        if pymupdf is None:
+            raise ValueError("PDF reports require PyMuPDF (pip install pymupdf)")
+        self.max_dim = max_dim
+        try:
+            self._document = pymupdf.open(stream=data, filetype="pdf")
+        except Exception as e:
+            raise ValueError(f"Could not open PDF: {str(e)}")
+        if self._document.needs_pass:
+            self._document.close()
+            raise ValueError("Password-protected PDFs are not supported")
+
+    @property
+    def page_count(self):
+        return self._document.page_count
+
+    def render(self, index):
+        """
+        Rasterize one page so its long side is at most max_dim pixels.
+
+        Returns:
+            bytes: PNG image of the page
+        """
+        page = self._document[index]
+        zoom = self.max_dim / max(page.rect.width, page.rect.height, 1)
+        pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+        return pixmap.tobytes("png")
+
+    def close(self):
+        self._document.close()
@@ -0,0 +1,201 @@
+import os
+import copy
+import json
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from database import mongodb
+
+# Response cache configuration
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+RESPONSE_CACHE_COLLECTION = "response_cache"
+
+
+def normalize_payload(value):
+    """
+    Normalize request input so equivalent submissions hash identically.
+
+    Strings are trimmed, whitespace-collapsed and case-folded, unset fields
+    are dropped and lists of plain values are sorted.
+    """
+    if isinstance(value, dict):
+        return {
+            str(key): normalize_payload(item)
+            for key, item in value.items()
+            if item is not None and item != [] and item != {}
+        }
+    if isinstance(value, (list, tuple)):
+        items = [normalize_payload(item) for item in value if item is not None]
+        if all(isinstance(item, (str, int, float, bool)) for item in items):
+            return sorted(items, key=lambda item: (type(item).__name__, item))
+        return items
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def make_cache_key(namespace, payload, prompt_version):
+    """
+    Build a content-addressed key from normalized input and the prompt version.
+
+    Returns:
+        str: Hex SHA-256 digest identifying the request
+    """
+    canonical = json.dumps(
+        {"namespace": namespace, "prompt_version": prompt_version, "input": normalize_payload(payload)},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for LLM responses.
+
+    Lookups hit an in-process LRU first and fall back to a MongoDB
+    collection shared by every worker, whose entries expire through a TTL
+    index. Mongo failures are logged and treated as misses so the cache can
+    never fail a request. Values are copied on the way in and out, so
+    callers may mutate what they store or get back.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl=RESPONSE_CACHE_TTL,
+                 collection_name=RESPONSE_CACHE_COLLECTION):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.collection_name = collection_name
+        self._entries = OrderedDict()  # key -> (namespace, expires_at, value)
+        self._counters = {
+            "memory_hits": 0,
+            "mongo_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+        self._namespace_counters = {}  # namespace -> counters like _counters
+
+    def _count(self, counter, namespace, amount=1):
+        self._counters[counter] += amount
+        counters = self._namespace_counters.get(namespace)
+        if counters is None:
+            counters = self._namespace_counters[namespace] = dict.fromkeys(self._counters, 0)
+        counters[counter] += amount
+
+    def _collection(self):
+        if mongodb.db is None:
+            return None
+        return mongodb.db[self.collection_name]
+
+    def _remember(self, key, namespace, expires_at, value):
+        self._entries[key] = (namespace, expires_at, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            _, (evicted_namespace, _, _) = self._entries.popitem(last=False)
+            self._count("evictions", evicted_namespace)
+
+    async def get(self, key, namespace=None):
+        """
+        Return the cached value for a key, or None on a miss.
+
+        Args:
+            key: Key built with make_cache_key
+            namespace: Namespace the key belongs to, used to attribute misses in stats()
+        """
+        now = datetime.utcnow()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                self._entries.move_to_end(key)
+                self._count("memory_hits", entry[0])
+                return copy.deepcopy(entry[2])
+            del self._entries[key]
+            self._count("expirations", entry[0])
+
+        collection = self._collection()
+        if collection is not None:
+            try:
+                doc = await collection.find_one({"_id": key, "expires_at": {"$gt": now}})
+            except Exception as e:
+                print(f"Response cache lookup failed: {e}")
+                doc = None
+            if doc is not None:
+                self._remember(key, doc.get("namespace"), doc["expires_at"], doc["value"])
+                self._count("mongo_hits", doc.get("namespace"))
+                return doc["value"]
+
+        self._count("misses", namespace)
+        return None
+
+    async def set(self, key, value, namespace=None):
+        """Store a value in both tiers."""
+        expires_at = datetime.utcnow() + timedelta(seconds=self.ttl)
+        self._remember(key, namespace, expires_at, value)
+
+        collection = self._collection()
+        if collection is not None:
+            try:
+                await collection.replace_one(
+                    {"_id": key},
+                    {"_id": key, "namespace": namespace, "value": value, "expires_at": expires_at},
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"Response cache write failed: {e}")
+
+    async def invalidate(self, key=None, namespace=None):
+        """
+        Drop one key, every key in a namespace, or the whole cache.
+
+        Returns:
+            int: Number of in-memory entries removed
+        """
+        if key is not None:
+            keys = [key] if key in self._entries else []
+            query = {"_id": key}
+        elif namespace is not None:
+            keys = [k for k, entry in self._entries.items() if entry[0] == namespace]
+            query = {"namespace": namespace}
+        else:
+            keys = list(self._entries)
+            query = {}
+
+        for k in keys:
+            self._count("invalidations", self._entries.pop(k)[0])
+
+        collection = self._collection()
+        if collection is not None:
+            try:
+                await collection.delete_many(query)
+            except Exception as e:
+                print(f"Response cache invalidation failed: {e}")
+        return len(keys)
+
+    def stats(self, namespaces=None):
+        """
+        Return hit, miss and eviction counters.
+
+        Args:
+            namespaces: Only count these namespaces; every namespace when omitted
+        """
+        if namespaces is None:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+        else:
+            stats = dict.fromkeys(self._counters, 0)
+            for namespace in namespaces:
+                for counter, value in self._namespace_counters.get(namespace, {}).items():
+                    stats[counter] += value
+            stats["entries"] = sum(1 for entry in self._entries.values() if entry[0] in namespaces)
+        stats["hits"] = stats["memory_hits"] + stats["mongo_hits"]
+        return stats
+
+
+# Shared cache used by the AI services
+response_cache = ResponseCache()
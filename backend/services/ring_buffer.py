@@ -0,0 +1,69 @@
+from array import array
+
+
+class RingBuffer:
+    """
+    Fixed-capacity numeric series backed by a compact ``array``.
+
+    Appends overwrite the oldest values once the buffer is full, so memory
+    stays constant however long a session runs. Values are addressed by
+    their absolute position in the full series, which lets callers tell
+    which part of the series is still retained.
+    """
+
+    def __init__(self, capacity, typecode="h"):
+        if capacity < 1:
+            raise ValueError("RingBuffer capacity must be at least 1")
+        self.capacity = capacity
+        self.typecode = typecode
+        self._data = array(typecode)
+        self._start = 0  # physical index of the oldest value once full
+        self.total = 0  # values appended over the buffer's lifetime
+
+    def append(self, value):
+        if len(self._data) < self.capacity:
+            self._data.append(value)
+        else:
+            self._data[self._start] = value
+            self._start = (self._start + 1) % self.capacity
+        self.total += 1
+
+    @property
+    def first_index(self):
+        """Absolute index of the oldest retained value."""
+        return self.total - len(self._data)
+
+    def to_list(self):
+        """Return the retained values, oldest first."""
+        return (self._data[self._start:] + self._data[:self._start]).tolist()
+
+    def since(self, index):
+        """
+        Return retained values from an absolute index onwards.
+
+        Raises:
+            IndexError: If values from that index have already been overwritten
+        """
+        if index < self.first_index:
+            raise IndexError(f"Values before index {self.first_index} are no longer retained")
+        return self.to_list()[index - self.first_index:]
+
+    def downsample(self, max_points):
+        """
+        Return at most ``max_points`` retained values, evenly strided.
+
+        Buffers appended in lockstep stay aligned after downsampling.
+        """
+        values = self.to_list()
+        if max_points <= 0 or len(values) <= max_points:
+            return values
+        step = len(values) / max_points
+        return [values[int(i * step)] for i in range(max_points)]
+
+    def clear(self):
+        self._data = array(self.typecode)
+        self._start = 0
+        self.total = 0
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,195 @@
+import base64
+
+import numpy as np
+
+# Level-of-detail modes for angle series in performance summaries
+SUMMARY_MODES = ("stride", "minmax", "lttb")
+# Wire encodings for the resulting series
+SUMMARY_ENCODINGS = ("json", "binary")
+
+INT16_MIN, INT16_MAX = -32768, 32767
+
+
+def stride_indices(length, max_points):
+    """Return evenly strided indices selecting at most max_points of length values."""
+    if max_points <= 0 or length <= max_points:
+        return np.arange(length)
+    return (np.arange(max_points) * (length / max_points)).astype(np.int64)
+
+
+def lttb_indices(values, max_points):
+    """
+    Select indices with Largest-Triangle-Three-Buckets downsampling.
+
+    LTTB keeps the first and last points and, from each bucket in between,
+    the point forming the largest triangle with the previously kept point
+    and the next bucket's average. Peaks and troughs survive, which plain
+    striding tends to skip.
+
+    Args:
+        values: 1D sequence of y values sampled at unit spacing
+        max_points: Number of points to keep
+
+    Returns:
+        numpy.ndarray: Sorted indices of the kept points
+    """
+    y = np.asarray(values, dtype=np.float64)
+    length = len(y)
+    if max_points <= 0 or length <= max_points:
+        return np.arange(length)
+    if max_points < 3:
+        return stride_indices(length, max_points)
+
+    bucket_size = (length - 2) / (max_points - 2)
+    indices = np.empty(max_points, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = length - 1
+    previous = 0
+
+    for i in range(max_points - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, length)
+
+        # Average of the next bucket (the last point for the final bucket)
+        if next_start >= next_end:
+            avg_x, avg_y = length - 1, y[-1]
+        else:
+            avg_x = (next_start + next_end - 1) / 2.0
+            avg_y = y[next_start:next_end].mean()
+
+        candidates = np.arange(start, end)
+        areas = np.abs(
+            (previous - avg_x) * (y[candidates] - y[previous])
+            - (previous - candidates) * (avg_y - y[previous])
+        )
+        previous = int(candidates[np.argmax(areas)])
+        indices[i + 1] = previous
+
+    return indices
+
+
+def minmax_buckets(values, buckets):
+    """
+    Reduce a series to per-bucket minimum and maximum values.
+
+    Returns:
+        tuple: (bucket start indices, minimums, maximums)
+    """
+    y = np.asarray(values)
+    length = len(y)
+    if buckets <= 0 or length <= buckets:
+        return np.arange(length), y, y
+    edges = stride_indices(length, buckets)
+    return edges, np.minimum.reduceat(y, edges), np.maximum.reduceat(y, edges)
+
+
+def encode_delta_int16(values):
+    """
+    Encode an integer series as base64 little-endian int16 deltas.
+
+    The first value is carried separately so large frame indexes still fit.
+    Clients decode by base64-decoding ``data`` into an Int16Array and
+    taking the running sum starting from ``first``.
+
+    Raises:
+        ValueError: If a delta does not fit in int16
+    """
+    series = np.asarray(values, dtype=np.int64)
+    if len(series) == 0:
+        return {"first": None, "count": 0, "data": ""}
+    deltas = np.diff(series)
+    if len(deltas) and (deltas.min() < INT16_MIN or deltas.max() > INT16_MAX):
+        raise ValueError("Series delta does not fit in int16")
+    return {
+        "first": int(series[0]),
+        "count": int(len(series)),
+        "data": base64.b64encode(deltas.astype("<i2").tobytes()).decode("ascii")
+    }
+
+
+def decode_delta_int16(encoded):
+    """Decode a series produced by encode_delta_int16."""
+    if not encoded["count"]:
+        return []
+    deltas = np.frombuffer(base64.b64decode(encoded["data"]), dtype="<i2").astype(np.int64)
+    return np.concatenate(([encoded["first"]], encoded["first"] + np.cumsum(deltas))).tolist()
+
+
+def align_series(series, frame_indexes):
+    """
+    Restrict series to the frames every one of them has a value for.
+
+    Series recorded by different exercises hold values for different
+    frames, so they are matched on frame index rather than position.
+
+    Args:
+        series: Dict of name -> list of values
+        frame_indexes: Dict of name -> increasing frame index of each value in series
+
+    Returns:
+        dict: Equally long aligned series, plus "frames" holding the shared frame indexes
+    """
+    shared = None
+    for name in series:
+        indexes = np.asarray(frame_indexes[name], dtype=np.int64)
+        shared = indexes if shared is None else np.intersect1d(shared, indexes, assume_unique=True)
+    if shared is None:
+        return {"frames": []}
+
+    aligned = {}
+    for name, values in series.items():
+        positions = np.searchsorted(np.asarray(frame_indexes[name], dtype=np.int64), shared)
+        aligned[name] = np.asarray(values, dtype=np.int64)[positions].tolist()
+    aligned["frames"] = shared.tolist()
+    return aligned
+
+
+def summarize_series(series, max_points, mode="stride", encoding="json", reference=None):
+    """
+    Downsample aligned series and encode them for a summary payload.
+
+    Args:
+        series: Dict of name -> equally long list of integers (e.g. angles and frame indexes)
+        max_points: Target number of points (buckets for "minmax")
+        mode: "stride", "minmax" or "lttb"
+        encoding: "json" for plain lists, "binary" for delta-encoded int16
+        reference: Series name whose shape drives LTTB point selection
+
+    Returns:
+        dict: Downsampled series, plus the mode and encoding used
+
+    Raises:
+        ValueError: If the mode or encoding is unknown or the series differ in length
+    """
+    if mode not in SUMMARY_MODES:
+        raise ValueError(f"Unknown summary mode: {mode}")
+    if encoding not in SUMMARY_ENCODINGS:
+        raise ValueError(f"Unknown summary encoding: {encoding}")
+
+    lengths = {len(values) for values in series.values()}
+    if len(lengths) > 1:
+        raise ValueError("Series must be aligned to the same frames, see align_series")
+    length = lengths.pop() if lengths else 0
+    arrays = {name: np.asarray(values, dtype=np.int64) for name, values in series.items()}
+    encode = encode_delta_int16 if encoding == "binary" else (lambda values: np.asarray(values).tolist())
+
+    result = {"mode": mode, "encoding": encoding, "points": length}
+    if mode == "minmax":
+        for name, values in arrays.items():
+            edges, minimums, maximums = minmax_buckets(values, max_points)
+            if name == "frames":
+                # Frame indexes label each bucket by its first frame
+                result[name] = encode(values[edges])
+            else:
+                result[name] = {"min": encode(minimums), "max": encode(maximums)}
+        return result
+
+    if mode == "lttb" and reference in arrays:
+        indices = lttb_indices(arrays[reference], max_points)
+    else:
+        indices = stride_indices(length, max_points)
+    for name, values in arrays.items():
+        result[name] = encode(values[indices])
+    return result
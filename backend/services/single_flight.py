@@ -0,0 +1,52 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the work as its own task; callers
+    arriving while it runs wait on the same task and get the same result
+    or exception. Results are not kept once the task finishes. Because the
+    work runs in a separate task, a caller that is cancelled (e.g. its
+    client disconnected) does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._counters = {"executions": 0, "coalesced": 0, "errors": 0}
+
+    async def do(self, key, factory):
+        """
+        Run factory() for key, or join the execution already in flight.
+
+        Args:
+            key: Hashable identity of the call
+            factory: Zero-argument callable returning an awaitable
+
+        Returns:
+            The awaitable's result
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self._counters["executions"] += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._counters["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            self._counters["errors"] += 1
+
+    def stats(self):
+        """Return execution and coalescing counters."""
+        stats = dict(self._counters)
+        calls = stats["executions"] + stats["coalesced"]
+        stats["coalesced_ratio"] = round(stats["coalesced"] / calls, 4) if calls else 0.0
+        stats["in_flight"] = len(self._inflight)
+        return stats
@@ -0,0 +1,200 @@
+import os
+import csv
+import json
+from collections import deque
+
+# Optional JSON object or two-column CSV (term, specialty) extending the built-in vocabulary
+SPECIALTY_SYNONYMS_PATH = os.getenv("SPECIALTY_SYNONYMS_PATH")
+
+# Condition-to-specialty mapping with more variations
+CONDITION_SPECIALTY_MAP = {
+    # Cardiovascular
+    "hypertension": "Cardiologist",
+    "high blood pressure": "Cardiologist",
+    "heart attack": "Cardiologist",
+    "arrhythmia": "Cardiologist",
+    "cardiovascular": "Cardiologist",
+    "cardiovascular disease": "Cardiologist",
+    "heart": "Cardiologist",
+    "chest pain": "Cardiologist",
+
+    # Respiratory
+    "asthma": "Pulmonologist",
+    "bronchitis": "Pulmonologist",
+    "pneumonia": "Pulmonologist",
+    "copd": "Pulmonologist",
+    "difficulty breathing": "Pulmonologist",
+
+    # Dermatology
+    "eczema": "Dermatologist",
+    "rash": "Dermatologist",
+    "acne": "Dermatologist",
+    "psoriasis": "Dermatologist",
+    "skin infection": "Dermatologist",
+
+    # Neurology
+    "headache": "Neurologist",
+    "migraine": "Neurologist",
+    "seizure": "Neurologist",
+    "stroke": "Neurologist",
+    "multiple sclerosis": "Neurologist",
+
+    # ENT
+    "nasal": "ENT Specialist",
+    "nasal trauma": "ENT Specialist",
+    "nose": "ENT Specialist",
+    "nosebleed": "ENT Specialist",
+    "ear": "ENT Specialist",
+    "throat": "ENT Specialist",
+    "sinus": "ENT Specialist",
+
+    # Gastroenterology
+    "gastritis": "Gastroenterologist",
+    "ulcer": "Gastroenterologist",
+    "ibs": "Gastroenterologist",
+    "stomach pain": "Gastroenterologist",
+    "nausea": "Gastroenterologist",
+
+    # Orthopedics
+    "fracture": "Orthopedist",
+    "joint pain": "Orthopedist",
+    "arthritis": "Orthopedist",
+    "back pain": "Orthopedist",
+    "sprain": "Orthopedist",
+
+    # Hematology
+    "anemia": "Hematologist",
+    "blood disorder": "Hematologist",
+    "bleeding": "Hematologist",
+
+    # General
+    "fever": "General Practitioner",
+    "cold": "General Practitioner",
+    "flu": "General Practitioner",
+    "fatigue": "General Practitioner",
+    "general": "General Practitioner"
+}
+
+# Direct mapping for doctor referrals
+SPECIALTY_MAPPING = {
+    "general practitioner": "General Practitioner",
+    "cardiologist": "Cardiologist",
+    "neurologist": "Neurologist",
+    "dermatologist": "Dermatologist",
+    "pulmonologist": "Pulmonologist",
+    "gastroenterologist": "Gastroenterologist",
+    "orthopedist": "Orthopedist",
+    "hematologist": "Hematologist",
+    "otolaryngologist": "ENT Specialist",
+    "ent": "ENT Specialist"
+}
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton that finds every keyword occurring in a text.
+
+    Matching is a single pass over the text regardless of vocabulary size,
+    and overlapping keywords (e.g. "heart" inside "heart attack") are all
+    reported, just like testing each keyword with ``in``.
+    """
+
+    def __init__(self, mapping):
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [frozenset()]
+
+        for keyword, value in mapping.items():
+            keyword = keyword.lower()
+            if not keyword:
+                continue
+            node = 0
+            for char in keyword:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append(frozenset())
+                node = next_node
+            self._outputs[node] = self._outputs[node] | {value}
+
+        # Breadth-first pass to set failure links and merge inherited outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._outputs[child] = self._outputs[child] | self._outputs[self._fail[child]]
+                queue.append(child)
+
+    def match(self, text):
+        """Return the set of values for every keyword contained in the text."""
+        found = set()
+        node = 0
+        for char in text.lower():
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            if self._outputs[node]:
+                found.update(self._outputs[node])
+        return found
+
+
+def load_synonyms(path):
+    """
+    Load an external term-to-specialty vocabulary.
+
+    Args:
+        path: JSON file holding an object, or CSV file with term and specialty columns
+
+    Returns:
+        dict: Lower-cased term to specialty mapping
+    """
+    if not path:
+        return {}
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            if path.lower().endswith(".json"):
+                synonyms = json.load(f)
+            else:
+                synonyms = {row[0]: row[1] for row in csv.reader(f) if len(row) >= 2}
+        print(f"Loaded {len(synonyms)} specialty synonyms from {path}")
+        return {str(term).strip().lower(): str(specialty).strip() for term, specialty in synonyms.items()}
+    except Exception as e:
+        print(f"Error loading specialty synonyms: {str(e)}")
+        return {}
+
+
+# Compiled once at import time
+condition_matcher = KeywordMatcher({**CONDITION_SPECIALTY_MAP, **load_synonyms(SPECIALTY_SYNONYMS_PATH)})
+referral_matcher = KeywordMatcher(SPECIALTY_MAPPING)
+
+
+def specialties_for_conditions(conditions):
+    """Return the specialties whose keywords appear in any of the conditions."""
+    specialties = set()
+    for condition in conditions:
+        if isinstance(condition, str):
+            specialties.update(condition_matcher.match(condition))
+    return specialties
+
+
+def specialties_for_referrals(referrals):
+    """Return the specialties named by doctor referrals, allowing partial matches."""
+    specialties = set()
+    for referral in referrals:
+        referral_lower = referral.lower()
+        if referral_lower in SPECIALTY_MAPPING:
+            specialties.add(SPECIALTY_MAPPING[referral_lower])
+            continue
+        # Keywords inside the referral, then referrals that abbreviate a keyword
+        specialties.update(referral_matcher.match(referral_lower))
+        for key, specialty in SPECIALTY_MAPPING.items():
+            if referral_lower in key:
+                specialties.add(specialty)
+    return specialties
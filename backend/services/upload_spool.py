@@ -0,0 +1,44 @@
+import os
+
+from starlette.concurrency import run_in_threadpool
+
+# Bytes read per chunk when spooling uploads to disk
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the size allowed for it."""
+
+
+async def spool_upload(upload, path, max_bytes=None, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Copy an uploaded file to disk in chunks without blocking the event loop.
+
+    Chunks are read from the upload asynchronously and the file is opened,
+    written and closed in the thread pool, so large uploads are never held
+    in memory and disk I/O never stalls other requests. A partially written
+    file is left for the caller to remove.
+
+    Args:
+        upload: FastAPI UploadFile to read
+        path: Destination file path
+        max_bytes: Reject uploads larger than this many bytes; None allows any size
+        chunk_size: Bytes read per chunk
+
+    Returns:
+        int: Number of bytes written
+
+    Raises:
+        UploadTooLarge: If the upload exceeds max_bytes
+    """
+    size = 0
+    spool = await run_in_threadpool(open, path, "wb")
+    try:
+        while chunk := await upload.read(chunk_size):
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+            await run_in_threadpool(spool.write, chunk)
+    finally:
+        await run_in_threadpool(spool.close)
+    return size
@@ -0,0 +1,179 @@
+import os
+import time
+from itertools import islice
+
+import cv2
+import numpy as np
+import mediapipe as mp
+
+from services.ai_gymtrainer import GymTrainerService
+from services.motion_gate import frame_signature
+from services.exercise_rules import exercise_registry
+from services.pose_angles import landmarks_to_array, joint_angles
+from services.ring_buffer import RingBuffer
+from services.vision_executor import VisionExecutor
+
+mp_pose = mp.solutions.pose
+
+# Video analysis configuration
+VIDEO_FRAME_STRIDE = int(os.getenv("VIDEO_FRAME_STRIDE", "2"))
+VIDEO_MOTION_THRESHOLD = float(os.getenv("VIDEO_MOTION_THRESHOLD", "0"))
+VIDEO_BATCH_SIZE = int(os.getenv("VIDEO_BATCH_SIZE", "32"))
+VIDEO_SERIES_WINDOW = int(os.getenv("VIDEO_SERIES_WINDOW", "36000"))
+VIDEO_SERIES_MAX_POINTS = int(os.getenv("VIDEO_SERIES_MAX_POINTS", "1000"))
+# Offline analysis gets its own workers so uploads never hold up live frames
+VIDEO_WORKERS = int(os.getenv("VIDEO_WORKERS", "1"))
+VIDEO_MAX_PENDING = int(os.getenv("VIDEO_MAX_PENDING", "4"))
+VIDEO_QUEUE_TIMEOUT = float(os.getenv("VIDEO_QUEUE_TIMEOUT", "2"))
+
+
+def sample_frames(path, stride=VIDEO_FRAME_STRIDE, motion_threshold=VIDEO_MOTION_THRESHOLD, stats=None):
+    """
+    Decode a video lazily and yield the frames worth analysing.
+
+    Frames between samples are only grabbed, never decoded. With a motion
+    threshold, a sampled frame is also skipped when its thumbnail differs
+    from the last yielded one by less than the threshold (mean absolute
+    difference of 0-255 grayscale values).
+
+    Args:
+        path: Path of the video file
+        stride: Analyse every Nth frame
+        motion_threshold: Minimum thumbnail difference to analyse a frame; 0 disables it
+        stats: Optional dict updated with frame counts and the video's frame rate
+
+    Yields:
+        tuple: (frame_index, timestamp_seconds, BGR frame)
+    """
+    stats = stats if stats is not None else {}
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError("Could not open video file")
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    stats.update({"video_fps": fps, "frames_total": 0, "frames_sampled": 0})
+    stride = max(1, stride)
+    last_thumbnail = None
+
+    try:
+        frame_index = 0
+        while True:
+            if frame_index % stride:
+                if not capture.grab():
+                    break
+                frame_index += 1
+                continue
+
+            ok, frame = capture.read()
+            if not ok:
+                break
+
+            if motion_threshold > 0:
+                thumbnail = frame_signature(frame)
+                moved = last_thumbnail is None or np.abs(thumbnail - last_thumbnail).mean() >= motion_threshold
+            else:
+                thumbnail, moved = None, True
+
+            if moved:
+                last_thumbnail = thumbnail
+                stats["frames_sampled"] += 1
+                yield frame_index, frame_index / fps, frame
+            frame_index += 1
+    finally:
+        stats["frames_total"] = frame_index
+        capture.release()
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def analyze_video(path, exercise_choice, stride=VIDEO_FRAME_STRIDE,
+                  motion_threshold=VIDEO_MOTION_THRESHOLD, batch_size=VIDEO_BATCH_SIZE):
+    """
+    Count reps in a recorded workout video.
+
+    Frames are decoded and scored a chunk at a time, so memory stays flat
+    regardless of video length. MediaPipe runs one image at a time in
+    video-tracking mode; joint angles for the whole chunk are then computed
+    in one vectorized pass and fed to the recognisers in order.
+
+    Args:
+        path: Path of the video file
+        exercise_choice: Exercise id from the exercise registry
+        stride: Analyse every Nth frame
+        motion_threshold: Skip frames whose thumbnail barely changed; 0 disables it
+        batch_size: Frames per processing chunk
+
+    Returns:
+        dict: Rep count, per-rep timestamps, downsampled angle series and throughput stats
+    """
+    started = time.perf_counter()
+    tracker = GymTrainerService(angle_window=VIDEO_SERIES_WINDOW)
+    stats = {}
+    rep_events = []
+    timestamps = RingBuffer(VIDEO_SERIES_WINDOW, typecode="f")
+    frames_with_pose = 0
+
+    with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+        for batch in _batches(sample_frames(path, stride, motion_threshold, stats), batch_size):
+            detected = []
+            for frame_index, timestamp, frame in batch:
+                image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                image.flags.writeable = False
+                results = pose.process(image)
+                if results.pose_landmarks:
+                    detected.append((frame_index, timestamp, landmarks_to_array(results.pose_landmarks.landmark)))
+
+            if not detected:
+                continue
+            frames_with_pose += len(detected)
+
+            landmark_stack = np.stack([landmarks for _, _, landmarks in detected])
+            angle_stack = joint_angles(landmark_stack)
+            for (frame_index, timestamp, _), landmarks, angles in zip(detected, landmark_stack, angle_stack):
+                reps_before = tracker.exercise_counters[exercise_choice]
+                tracker.recognise_landmarks(landmarks, angles, exercise_choice)
+                timestamps.append(timestamp)
+                if tracker.exercise_counters[exercise_choice] > reps_before:
+                    rep_events.append({
+                        "rep": tracker.exercise_counters[exercise_choice],
+                        "timestamp": round(timestamp, 3),
+                        "frame": frame_index
+                    })
+
+    elapsed = time.perf_counter() - started
+    # Series are appended in lockstep, so downsampling keeps them aligned
+    angle_series = {
+        "timestamps": [round(t, 3) for t in timestamps.downsample(VIDEO_SERIES_MAX_POINTS)]
+    }
+    for name in exercise_registry.get(exercise_choice).series:
+        angle_series[name] = tracker.series(name).downsample(VIDEO_SERIES_MAX_POINTS)
+
+    return {
+        "exercise_type": exercise_registry.label(exercise_choice),
+        "reps": tracker.exercise_counters[exercise_choice],
+        "rep_events": rep_events,
+        "angle_series": angle_series,
+        "stats": {
+            "video_fps": round(stats.get("video_fps", 0), 2),
+            "duration_seconds": round(stats.get("frames_total", 0) / (stats.get("video_fps") or 30.0), 2),
+            "frames_total": stats.get("frames_total", 0),
+            "frames_sampled": stats.get("frames_sampled", 0),
+            "frames_with_pose": frames_with_pose,
+            "processing_seconds": round(elapsed, 2),
+            "processing_fps": round(stats.get("frames_total", 0) / elapsed, 1) if elapsed else 0,
+            "inference_fps": round(stats.get("frames_sampled", 0) / elapsed, 1) if elapsed else 0
+        }
+    }
+
+
+# Executor for uploaded videos, separate from the live-stream vision executor
+video_executor = VisionExecutor(
+    workers=VIDEO_WORKERS, max_pending=VIDEO_MAX_PENDING, queue_timeout=VIDEO_QUEUE_TIMEOUT
+)
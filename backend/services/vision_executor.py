@@ -0,0 +1,201 @@
+import os
+import zlib
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+
+from services.pose_pool import pose_pool
+from services.motion_gate import MotionGate, frame_signature
+from services.pose_angles import landmarks_to_array
+from services.frame_preprocess import (
+    VISION_ROI_CROP, decode_frame, roi_from_landmarks, roi_contains, crop_to_roi,
+    landmarks_to_full_frame
+)
+
+# Vision executor configuration
+VISION_EXECUTOR_MODE = os.getenv("VISION_EXECUTOR_MODE", "process")  # "process" or "thread"
+VISION_WORKERS = int(os.getenv("VISION_WORKERS", str(os.cpu_count() or 1)))
+VISION_MAX_PENDING = int(os.getenv("VISION_MAX_PENDING", "64"))
+VISION_QUEUE_TIMEOUT = float(os.getenv("VISION_QUEUE_TIMEOUT", "2"))
+
+
+class VisionBackpressure(Exception):
+    """Raised when the vision queue is full and a frame cannot be accepted in time."""
+
+
+def _infer(pose, state, image, box):
+    # Tracking and smoothing state is only valid in one coordinate frame, so
+    # start over whenever the input switches between the full frame and a crop
+    if "input_box" in state and state["input_box"] != box:
+        pose.reset()
+    state["input_box"] = box
+
+    # Convert frame to RGB for MediaPipe
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    image.flags.writeable = False
+
+    results = pose.process(image)
+    if not results.pose_landmarks:
+        return None
+
+    # One compact array per frame; cheap to pickle back from a worker process
+    return landmarks_to_array(results.pose_landmarks.landmark)
+
+
+def detect_landmarks(session_key, frame_bytes):
+    """
+    Decode a frame and run pose inference with the session's Pose instance.
+
+    Runs inside a vision worker, so the Pose instance, its tracking state
+    and the session's region of interest live in the worker that owns the
+    session. The frame is decoded at the model's working size and, when the
+    previous frame found a pose, cropped to the region around it. The region
+    stays fixed while the person remains inside it, and the Pose instance's
+    tracking is reset whenever its input region changes. With
+    motion gating enabled, frames that barely differ from the last inferred
+    one reuse its landmarks instead of running the model.
+
+    Args:
+        session_key: Registry key of the session that sent the frame
+        frame_bytes: Encoded image bytes
+
+    Returns:
+        tuple: ((33, 3) landmark coordinates or None if no pose was detected,
+        whether inference actually ran)
+    """
+    frame = decode_frame(frame_bytes)
+    pose, state = pose_pool.lease_with_state(session_key)
+
+    gate = state.get("motion_gate")
+    if gate is None:
+        gate = state["motion_gate"] = MotionGate()
+    signature = frame_signature(frame) if gate.threshold > 0 else None
+    if signature is not None:
+        reused = gate.reuse(signature)
+        if reused is not None:
+            return reused, False
+
+    landmarks = None
+    roi = state.get("roi")
+    if roi is not None:
+        crop, box = crop_to_roi(frame, roi)
+        if crop is not None:
+            landmarks = _infer(pose, state, crop, box)
+            if landmarks is not None:
+                landmarks = landmarks_to_full_frame(landmarks, box, frame.shape)
+
+    # Fall back to the full frame when there is no region yet or the person left it
+    if landmarks is None:
+        roi = None
+        landmarks = _infer(pose, state, frame, None)
+
+    if landmarks is None or not VISION_ROI_CROP:
+        state["roi"] = None
+    elif roi is None or not roi_contains(roi, landmarks):
+        state["roi"] = roi_from_landmarks(landmarks)
+    if signature is not None:
+        gate.update(signature, landmarks)
+    return landmarks, True
+
+
+def release_session(session_key):
+    """Return a session's Pose instance to the worker's pool."""
+    pose_pool.release(session_key)
+
+
+class VisionExecutor:
+    """
+    Runs frame decoding and pose inference off the event loop.
+
+    Work is sharded over single-worker executors and every session is pinned
+    to one shard, so its Pose instance and tracking state always live in the
+    same worker and its frames are processed in order. At most
+    ``max_pending`` frames may be queued or running at once; further frames
+    wait up to ``queue_timeout`` seconds for a slot and are then rejected.
+    """
+
+    def __init__(self, mode=VISION_EXECUTOR_MODE, workers=VISION_WORKERS,
+                 max_pending=VISION_MAX_PENDING, queue_timeout=VISION_QUEUE_TIMEOUT):
+        if mode not in ("process", "thread"):
+            raise ValueError(f"Unknown vision executor mode: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._shards = None
+        self._slots = None
+
+    def _create_shard(self, index):
+        if self.mode == "process":
+            # MediaPipe starts its own threads, so never fork a live interpreter
+            return ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"vision-{index}")
+
+    def _shard_for(self, session_key):
+        if self._shards is None:
+            self._shards = [self._create_shard(i) for i in range(self.workers)]
+        return self._shards[zlib.crc32(session_key.encode("utf-8")) % self.workers]
+
+    async def detect(self, session_key, frame_bytes):
+        """
+        Detect pose landmarks for a frame on the session's shard.
+
+        Returns:
+            tuple: (landmark array or None, whether inference ran for this frame)
+
+        Raises:
+            VisionBackpressure: If no queue slot frees up within the timeout
+        """
+        return await self.run(session_key, detect_landmarks, session_key, frame_bytes)
+
+    async def run(self, shard_key, func, *args):
+        """
+        Run a picklable function on the shard for shard_key, under the pending-work limit.
+
+        Work on one shard runs in submission order, so long jobs belong on a
+        separate executor rather than the one serving live frames.
+
+        Returns:
+            The function's result
+
+        Raises:
+            VisionBackpressure: If no queue slot frees up within the timeout
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise VisionBackpressure(
+                f"Vision queue is full ({self.max_pending} jobs pending), try again shortly"
+            )
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._shard_for(shard_key), func, *args)
+        finally:
+            self._slots.release()
+
+    def release(self, session_key):
+        """Release a session's Pose instance once its queued frames are done."""
+        if self._shards is None:
+            return
+        self._shard_for(session_key).submit(release_session, session_key)
+
+    def shutdown(self):
+        """Stop every worker, dropping frames that have not started yet."""
+        if self._shards is None:
+            return
+        for shard in self._shards:
+            shard.shutdown(wait=False, cancel_futures=True)
+        self._shards = None
+
+
+# Shared executor used by the gym trainer service
+vision_executor = VisionExecutor()
@@ -0,0 +1,83 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import compounder
+from services import report_jobs
+from services.report_jobs import ReportJobQueue
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(compounder.router, prefix="/api/compounder")
+    return TestClient(app)
+
+
+def test_submit_report_job_returns_202(tmp_path, monkeypatch):
+    queue = ReportJobQueue(spool_dir=str(tmp_path))
+    submitted = {}
+
+    async def submit(job_id, user_id, filename, content_type, size, callback_url=None):
+        submitted.update(job_id=job_id, user_id=user_id, size=size)
+        return {"_id": job_id, "status": "queued"}
+
+    monkeypatch.setattr(queue, "submit", submit)
+    monkeypatch.setattr(compounder, "report_job_queue", queue)
+
+    response = _client().post(
+        "/api/compounder/analyze-report/jobs",
+        data={"user_id": "user-1"},
+        files={"file": ("report.png", b"\x89PNG\r\n\x1a\n" + b"0" * 64, "image/png")}
+    )
+
+    assert response.status_code == 202
+    data = response.json()["data"]
+    assert data["job_id"] == submitted["job_id"]
+    assert data["status"] == "queued"
+    assert data["status_url"] == f"/api/compounder/jobs/{data['job_id']}?user_id=user-1"
+    assert submitted["user_id"] == "user-1"
+    assert submitted["size"] == 72
+    assert (tmp_path / f"{data['job_id']}.upload").read_bytes().startswith(b"\x89PNG")
+
+
+def test_job_status_is_only_visible_to_its_owner(monkeypatch):
+    async def get_report_job(job_id):
+        return {"_id": job_id, "user_id": "user-1", "status": "completed", "result": {"summary": "ok"}}
+
+    monkeypatch.setattr(report_jobs, "get_report_job", get_report_job)
+    monkeypatch.setattr(compounder, "report_job_queue", ReportJobQueue())
+    client = _client()
+
+    assert client.get("/api/compounder/jobs/job-1", params={"user_id": "user-1"}).status_code == 200
+    assert client.get("/api/compounder/jobs/job-1", params={"user_id": "user-2"}).status_code == 404
+    assert client.get("/api/compounder/jobs/job-1").status_code == 422
+
+
+def test_resume_waits_for_room_instead_of_failing_jobs(tmp_path, monkeypatch):
+    jobs = [{"_id": f"job-{i}"} for i in range(3)]
+    updates = {}
+
+    async def get_unfinished_report_jobs():
+        return jobs
+
+    async def update_report_job(job_id, fields):
+        updates[job_id] = fields["status"]
+
+    monkeypatch.setattr(report_jobs, "get_unfinished_report_jobs", get_unfinished_report_jobs)
+    monkeypatch.setattr(report_jobs, "update_report_job", update_report_job)
+    queue = ReportJobQueue(max_size=1, spool_dir=str(tmp_path))
+    for job in jobs:
+        open(queue.spool_path(job["_id"]), "wb").close()
+
+    async def drain():
+        queue._queue = asyncio.Queue(maxsize=1)
+        resuming = asyncio.create_task(queue._resume_unfinished())
+        drained = []
+        while len(drained) < len(jobs):
+            drained.append(await queue._queue.get())
+        await resuming
+        return drained
+
+    assert asyncio.run(drain()) == ["job-0", "job-1", "job-2"]
+    assert set(updates.values()) == {"queued"}